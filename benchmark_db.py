@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Odd Fellow Coffee — SQLite Query Benchmarks & Index Advisor
+===========================================================
+Answers "where does the site fall over?" before real traffic does:
+- Generates a synthetic odd-fellow.db at realistic (or far larger) volumes:
+  years of weekly drops, subscriptions, and orders with JSON items
+- Replays the hot queries the storefront, admin panel and these scripts run,
+  timing each and recording its EXPLAIN QUERY PLAN
+- Tries each candidate index on its own and recommends the ones that make a
+  query at least --min-speedup times faster, with measured before/after
+  latency, build time and size
+
+The schema is read from src/lib/server/db.ts (SCHEMA plus its ALTER TABLE
+migrations), which declares no secondary indexes. Benchmarks run on a
+temporary copy of the database, so the live file is never modified.
+
+Usage:
+    python benchmark_db.py --generate synthetic.db --orders 1000000 --years 5
+    python benchmark_db.py --db synthetic.db -o db-bench.json
+    python benchmark_db.py                 # $DB_PATH or data/odd-fellow.db
+"""
+
+from datetime import date, datetime, timedelta
+from pathlib import Path
+import argparse
+import json
+import random
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import generate_drop_sheets
+import generate_user_guide as guide
+
+APP_DB_SOURCE = guide.PROJECT_DIR / "src" / "lib" / "server" / "db.ts"
+
+DEFAULT_ORDERS = 1_000_000
+DEFAULT_YEARS = 3
+DEFAULT_SUBSCRIPTIONS = 20_000
+DEFAULT_REPEAT = 5
+DEFAULT_MIN_SPEEDUP = 2.0
+INSERT_BATCH = 10_000
+
+# Generated orders use the same vocabulary as the app (validation.ts, csv.js)
+ORDER_STATUSES = (("delivered", 60), ("shipped", 10), ("confirmed", 20), ("pending", 10))
+PAST_STAGES = ("picked_up", "delivered")
+OPEN_STAGES = ("ordered", "baking", "ready")
+SUBSCRIPTION_STATUSES = (("active", 60), ("paused", 10), ("canceled", 25), ("past_due", 5))
+FREQUENCIES = ("weekly", "biweekly", "monthly")
+DROP_ORDER_SHARE = 0.4
+
+PRODUCTS = [
+    ("House Blend", "coffee", 1400, 1), ("Dark Roast", "coffee", 1500, 1), ("Decaf Blend", "coffee", 1400, 1),
+    ("Ethiopia Yirgacheffe", "coffee", 1800, 1), ("Sourdough Loaf", "bakery", 800, 0),
+    ("Seeded Rye", "bakery", 900, 0), ("Cinnamon Swirl", "bakery", 1000, 0),
+    ("Olive & Rosemary", "bakery", 1000, 0), ("Banana Bread", "bakery", 700, 0),
+    ("Cinnamon Roll", "bakery", 450, 0), ("Blueberry Muffin", "bakery", 350, 0),
+]
+
+# Hot queries, verbatim from the app where possible. params name values from
+# sample_params(); the dashboard's date('now') is left as the app has it.
+QUERIES = [
+    {"name": "daily-digest", "source": "src/routes/api/cron/daily-digest",
+     "sql": """SELECT s.*, p.name as product_name FROM subscriptions s
+               LEFT JOIN products p ON p.id = s.product_id
+               WHERE s.status = 'active' AND s.next_delivery_date = ?""",
+     "params": ("today",)},
+    {"name": "dashboard-overdue-subscriptions", "source": "admin/routes/dashboard.js",
+     "sql": "SELECT COUNT(*) as c FROM subscriptions WHERE status = 'active' AND next_delivery_date < date('now')",
+     "params": ()},
+    {"name": "calendar-subscriptions", "source": "admin/routes/calendar.js",
+     "sql": """SELECT next_delivery_date as d, COUNT(*) as c FROM subscriptions
+               WHERE status IN ('active','paused') AND next_delivery_date BETWEEN ? AND ? GROUP BY d""",
+     "params": ("month_start", "month_end")},
+    {"name": "drop-items-for-drop", "source": "admin/routes/drops.js",
+     "sql": """SELECT di.*, p.name as product_name FROM drop_items di
+               JOIN products p ON p.id = di.product_id
+               WHERE di.drop_id = ?""",
+     "params": ("drop_id",)},
+    {"name": "checkout-remaining", "source": "src/routes/api/checkout",
+     "sql": "SELECT SUM(quantity_available - quantity_sold) as r FROM drop_items WHERE drop_id = ?",
+     "params": ("drop_id",)},
+    {"name": "drop-orders-by-stage", "source": "admin orders board (drop_id, stage)",
+     "sql": "SELECT * FROM orders WHERE drop_id = ? AND stage = ?",
+     "params": ("drop_id", "stage")},
+    {"name": "drop-sheet", "source": "generate_drop_sheets.py",
+     "sql": generate_drop_sheets.DROP_QUERY,
+     "params": ("paid_statuses", "drop_id")},
+    {"name": "webhook-order-by-session", "source": "src/routes/api/webhook/stripe",
+     "sql": "SELECT * FROM orders WHERE stripe_session_id = ?",
+     "params": ("session_id",)},
+    {"name": "admin-orders-by-status", "source": "admin/routes/orders.js",
+     "sql": "SELECT * FROM orders WHERE status = ? ORDER BY created_at DESC",
+     "params": ("pending",)},
+    {"name": "calendar-orders-on-day", "source": "admin/routes/calendar.js",
+     "sql": "SELECT * FROM orders WHERE DATE(created_at) = ? ORDER BY created_at DESC",
+     "params": ("order_day",)},
+    {"name": "webhook-subscription", "source": "src/routes/api/webhook/stripe",
+     "sql": "SELECT customer_email, product_id FROM subscriptions WHERE stripe_subscription_id = ?",
+     "params": ("stripe_subscription_id",)},
+]
+
+# Indexes worth trying, each aimed at one or more QUERIES above
+CANDIDATE_INDEXES = [
+    ("idx_subscriptions_status_next_delivery", "subscriptions(status, next_delivery_date)"),
+    ("idx_subscriptions_stripe_subscription_id", "subscriptions(stripe_subscription_id)"),
+    ("idx_drop_items_drop_id", "drop_items(drop_id)"),
+    ("idx_orders_drop_id_stage", "orders(drop_id, stage)"),
+    ("idx_orders_drop_id_status", "orders(drop_id, status)"),
+    ("idx_orders_stripe_session_id", "orders(stripe_session_id)"),
+    ("idx_orders_status_created_at", "orders(status, created_at)"),
+    ("idx_orders_created_day", "orders(DATE(created_at), created_at)"),
+]
+
+
+# =============================================================================
+# SYNTHETIC DATABASE
+# =============================================================================
+
+def app_schema():
+    """(schema_sql, [alter_sql]) as declared in src/lib/server/db.ts."""
+    source = APP_DB_SOURCE.read_text()
+    schema = re.search(r"const SCHEMA = `(.*?)`;", source, re.S).group(1)
+    alters = re.findall(r"'(ALTER TABLE [^']+)'", source)
+    return schema, alters
+
+
+def create_schema(conn):
+    schema, alters = app_schema()
+    conn.executescript(schema)
+    columns = {}
+    for alter in alters:
+        table, column = re.match(r"ALTER TABLE (\w+) ADD COLUMN (\w+)", alter).groups()
+        if table not in columns:
+            columns[table] = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in columns[table]:
+            conn.execute(alter)
+            columns[table].add(column)
+
+
+def weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def insert_batched(conn, sql, rows):
+    """executemany in INSERT_BATCH chunks so generators never materialize."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= INSERT_BATCH:
+            conn.executemany(sql, batch)
+            batch.clear()
+    if batch:
+        conn.executemany(sql, batch)
+
+
+def generate_database(path, orders=DEFAULT_ORDERS, years=DEFAULT_YEARS,
+                      subscriptions=DEFAULT_SUBSCRIPTIONS, seed=1):
+    """Write a synthetic odd-fellow.db to path with the app's schema, no indexes.
+
+    Weekly Monday drops run from `years` ago to two weeks ahead; orders are
+    spread evenly over that history with ids ascending in time, and
+    DROP_ORDER_SHARE of them belong to a drop.
+    """
+    rng = random.Random(seed)
+    path = Path(path)
+    path.unlink(missing_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    create_schema(conn)
+
+    today = date.today()
+    start = today - timedelta(days=365 * years)
+    with conn:
+        conn.executemany("INSERT INTO products (name, category, price_cents, subscribable) VALUES (?, ?, ?, ?)",
+                         PRODUCTS)
+        products = conn.execute("SELECT id, name, category, price_cents FROM products").fetchall()
+        bakery = [p for p in products if p[2] == "bakery"]
+        coffee = [p for p in products if p[2] == "coffee"]
+        conn.executemany("INSERT INTO time_slots (day_of_week, start_time, end_time, capacity) VALUES (?, ?, ?, ?)",
+                         [(d, f"{h:02d}:00", f"{h + 1:02d}:00", 5) for d in range(1, 6) for h in (8, 10, 14)])
+
+        # Weekly drops, each with 3-4 bakery items
+        first_monday = start + timedelta(days=-start.weekday())
+        drops = []
+        day = first_monday
+        while day <= today + timedelta(days=14):
+            status = "closed" if day < today else ("live" if day - today < timedelta(days=7) else "scheduled")
+            drops.append((f"{day:%A} Sourdough Drop", day.isoformat(),
+                          f"{day - timedelta(days=2)}T18:00", f"{day}T12:00", "3:00 PM", "6:00 PM", status))
+            day += timedelta(days=7)
+        conn.executemany("""INSERT INTO drops (title, drop_date, opens_at, closes_at, pickup_start, pickup_end, status)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)""", drops)
+        drop_items = {}
+        for drop_id in range(1, len(drops) + 1):
+            for product in rng.sample(bakery, rng.randint(3, 4)):
+                available = rng.randrange(24, 81, 4)
+                cur = conn.execute("""INSERT INTO drop_items (drop_id, product_id, quantity_available, quantity_sold)
+                                      VALUES (?, ?, ?, ?)""",
+                                   (drop_id, product[0], available, rng.randint(available // 2, available)))
+                drop_items.setdefault(drop_id, []).append((cur.lastrowid, product))
+
+        span = (today - start).total_seconds()
+
+        def order_rows():
+            for i in range(orders):
+                created = datetime.combine(start, datetime.min.time()) + timedelta(seconds=span * i / max(orders, 1))
+                status = weighted(rng, ORDER_STATUSES)
+                if rng.random() < DROP_ORDER_SHARE:
+                    drop_id = min((created.date() - first_monday).days // 7 + 2, len(drops))
+                    lines = rng.sample(drop_items[drop_id], rng.randint(1, 2))
+                    items = [{"productId": p[0], "name": p[1], "price_cents": p[3], "quantity": rng.randint(1, 3),
+                              "dropItemId": di_id} for di_id, p in lines]
+                    stage = rng.choice(PAST_STAGES if drops[drop_id - 1][1] < today.isoformat() else OPEN_STAGES)
+                    shipping = None
+                else:
+                    drop_id, stage = None, None
+                    items = [{"productId": p[0], "name": p[1], "price_cents": p[3], "quantity": rng.randint(1, 2),
+                              "variant": rng.choice(("8oz whole", "16oz whole", "16oz medium"))}
+                             for p in rng.sample(coffee, rng.randint(1, 2))]
+                    shipping = json.dumps({"line1": f"{rng.randint(1, 9999)} Main St", "city": "Springfield",
+                                           "state": "MO", "postal_code": f"65{rng.randint(100, 999)}"})
+                customer = rng.randint(1, max(orders // 8, 1))
+                yield (f"cs_test_{i:08d}", f"customer{customer}@example.com", f"Customer {customer}",
+                       json.dumps(items), sum(it["price_cents"] * it["quantity"] for it in items), status,
+                       created.strftime("%Y-%m-%d %H:%M:%S"), stage, drop_id, shipping)
+
+        insert_batched(conn, """INSERT INTO orders (stripe_session_id, customer_email, customer_name, items,
+                                    total_cents, status, created_at, stage, drop_id, shipping_address)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", order_rows())
+
+        def subscription_rows():
+            for i in range(subscriptions):
+                product = rng.choice(coffee)
+                status = weighted(rng, SUBSCRIPTION_STATUSES)
+                next_delivery = today + timedelta(days=rng.randint(-10, 30))
+                yield (f"sub_test_{i:07d}", f"customer{rng.randint(1, max(orders // 8, 1))}@example.com",
+                       product[0], rng.choice(FREQUENCIES), status, "16oz whole", product[3],
+                       next_delivery.isoformat(), (next_delivery - timedelta(days=7)).isoformat())
+
+        insert_batched(conn, """INSERT INTO subscriptions (stripe_subscription_id, customer_email, product_id,
+                                    frequency, status, variant, price_cents, next_delivery_date, last_fulfilled_at)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", subscription_rows())
+    conn.close()
+
+
+# =============================================================================
+# MEASUREMENT
+# =============================================================================
+
+def sample_params(conn):
+    """Realistic parameter values for QUERIES, picked from the database itself."""
+    today = date.today()
+    drop_id = conn.execute("SELECT id FROM drops WHERE drop_date <= ? ORDER BY drop_date DESC LIMIT 1",
+                           (today.isoformat(),)).fetchone()
+    order = conn.execute("SELECT stripe_session_id, created_at FROM orders ORDER BY id DESC LIMIT 1").fetchone()
+    sub = conn.execute("SELECT stripe_subscription_id FROM subscriptions ORDER BY id DESC LIMIT 1").fetchone()
+    return {
+        "today": today.isoformat(),
+        "month_start": today.replace(day=1).isoformat(),
+        "month_end": (today.replace(day=28) + timedelta(days=4)).replace(day=1).isoformat(),
+        "drop_id": drop_id[0] if drop_id else 0,
+        "stage": "ready",
+        "paid_statuses": json.dumps(list(generate_drop_sheets.PAID_STATUSES)),
+        "session_id": order[0] if order else "",
+        "pending": "pending",
+        "order_day": order[1][:10] if order else today.isoformat(),
+        "stripe_subscription_id": sub[0] if sub else "",
+    }
+
+
+def query_plan(conn, query, params):
+    rows = conn.execute("EXPLAIN QUERY PLAN " + query["sql"], [params[p] for p in query["params"]])
+    return [row[3] for row in rows]
+
+
+def time_query(conn, query, params, repeat=DEFAULT_REPEAT):
+    """Median wall time in milliseconds of fetching every row, after one warm-up run."""
+    args = [params[p] for p in query["params"]]
+    conn.execute(query["sql"], args).fetchall()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(query["sql"], args).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def full_scans(plan):
+    """Tables the plan reads without an index."""
+    return [m.group(1) for step in plan if (m := re.match(r"SCAN (\w+)(?: AS \w+)?$", step))]
+
+
+def measure_queries(conn, params, queries, repeat):
+    return {q["name"]: {"ms": time_query(conn, q, params, repeat), "plan": query_plan(conn, q, params)}
+            for q in queries}
+
+
+def index_table(definition):
+    return definition.split("(", 1)[0]
+
+
+def query_tables(query):
+    return set(re.findall(r"\b(?:FROM|JOIN)\s+(\w+)", query["sql"], re.I))
+
+
+def used_bytes(conn):
+    """Bytes in use by the database file, not counting free pages."""
+    pages = conn.execute("PRAGMA page_count").fetchone()[0] - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return pages * conn.execute("PRAGMA page_size").fetchone()[0]
+
+
+def choose_indexes(candidates):
+    """Greedy pick by total milliseconds saved; a candidate is only kept if it
+    speeds up a query no better-saving pick already covers."""
+    covered, chosen = set(), []
+    for c in sorted(candidates, key=lambda c: -sum(g["before_ms"] - g["after_ms"] for g in c["improves"].values())):
+        if set(c["improves"]) - covered:
+            chosen.append(c)
+            covered.update(c["improves"])
+    return chosen
+
+
+def advise(conn, repeat=DEFAULT_REPEAT, min_speedup=DEFAULT_MIN_SPEEDUP):
+    """Time QUERIES, then each CANDIDATE_INDEXES entry on its own.
+
+    Each candidate is created, the queries touching its table are re-timed,
+    and it is dropped again, so every speedup is attributable to one index.
+    The chosen set is then created together and every query timed once more.
+    Returns {"params", "baseline", "candidates", "recommended", "after"}.
+    """
+    params = sample_params(conn)
+    baseline = measure_queries(conn, params, QUERIES, repeat)
+
+    candidates = []
+    for name, definition in CANDIDATE_INDEXES:
+        affected = [q for q in QUERIES if index_table(definition) in query_tables(q)]
+        before = used_bytes(conn)
+        start = time.perf_counter()
+        conn.execute(f"CREATE INDEX {name} ON {definition}")
+        build_ms = (time.perf_counter() - start) * 1000
+        size = used_bytes(conn) - before
+        after = measure_queries(conn, params, affected, repeat)
+        conn.execute(f"DROP INDEX {name}")
+
+        improved = {}
+        for query_name, result in after.items():
+            before_ms = baseline[query_name]["ms"]
+            speedup = before_ms / result["ms"] if result["ms"] else float("inf")
+            if name in " ".join(result["plan"]) and speedup >= min_speedup:
+                improved[query_name] = {"before_ms": before_ms, "after_ms": result["ms"],
+                                        "speedup": round(speedup, 1), "plan": result["plan"]}
+        candidates.append({"name": name, "definition": definition, "build_ms": round(build_ms, 1),
+                           "size_bytes": size, "improves": improved})
+
+    recommended = choose_indexes(candidates)
+    for c in recommended:
+        conn.execute(f"CREATE INDEX {c['name']} ON {c['definition']}")
+    after = measure_queries(conn, params, QUERIES, repeat) if recommended else baseline
+    return {"params": params, "baseline": baseline, "candidates": candidates,
+            "recommended": recommended, "after": after}
+
+
+def table_counts(conn):
+    return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("orders", "subscriptions", "drops", "drop_items")}
+
+
+def copy_database(source, target):
+    """Snapshot source into target with the backup API (safe while the app is writing)."""
+    src = guide.connect_readonly(source)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+    return dst
+
+
+# =============================================================================
+# REPORT
+# =============================================================================
+
+def print_report(result):
+    counts = ", ".join(f"{n:,} {t}" for t, n in result["tables"].items())
+    print(f"\nDatabase: {counts}\n")
+    print(f"{'Query':<34} {'ms':>10}  Plan")
+    for name, entry in result["baseline"].items():
+        scans = full_scans(entry["plan"])
+        plan = f"full scan of {', '.join(scans)}" if scans else "; ".join(entry["plan"])
+        print(f"{name:<34} {entry['ms']:>10.3f}  {plan}")
+
+    if not result["recommended"]:
+        print("\nNo candidate index sped up a query enough to recommend.")
+        return
+    print("\nRecommended indexes (each measured on its own):")
+    for c in result["recommended"]:
+        print(f"\n  CREATE INDEX IF NOT EXISTS {c['name']} ON {c['definition']};")
+        print(f"    build {c['build_ms']:.0f} ms, {c['size_bytes'] / 2**10:,.0f} KiB")
+        for query_name, gain in c["improves"].items():
+            print(f"    {query_name:<32} {gain['before_ms']:>9.3f} -> {gain['after_ms']:.3f} ms "
+                  f"({gain['speedup']}x)")
+
+    print(f"\nWith all recommended indexes:\n{'Query':<34} {'before ms':>10} {'after ms':>10}")
+    for name, entry in result["baseline"].items():
+        print(f"{name:<34} {entry['ms']:>10.3f} {result['after'][name]['ms']:>10.3f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the app's SQLite queries and recommend indexes.")
+    parser.add_argument("--db", type=Path, default=guide.DB_PATH,
+                        help="database to benchmark; it is copied first and never modified "
+                             "(default: $DB_PATH or data/odd-fellow.db)")
+    parser.add_argument("--generate", type=Path, metavar="PATH",
+                        help="write a synthetic database here first and benchmark that")
+    parser.add_argument("--orders", type=int, default=DEFAULT_ORDERS, metavar="N",
+                        help=f"synthetic orders (default: {DEFAULT_ORDERS:,})")
+    parser.add_argument("--years", type=int, default=DEFAULT_YEARS, metavar="N",
+                        help=f"years of weekly drops (default: {DEFAULT_YEARS})")
+    parser.add_argument("--subscriptions", type=int, default=DEFAULT_SUBSCRIPTIONS, metavar="N",
+                        help=f"synthetic subscriptions (default: {DEFAULT_SUBSCRIPTIONS:,})")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for --generate (default: 1)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, metavar="N",
+                        help=f"timed runs per query, median reported (default: {DEFAULT_REPEAT})")
+    parser.add_argument("--min-speedup", type=float, default=DEFAULT_MIN_SPEEDUP, metavar="X",
+                        help=f"recommend indexes that make a query X times faster (default: {DEFAULT_MIN_SPEEDUP})")
+    parser.add_argument("--generate-only", action="store_true", help="stop after --generate")
+    parser.add_argument("-o", "--output", type=Path, help="also write the full results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.generate:
+        start = time.perf_counter()
+        print(f"Generating {args.orders:,} orders over {args.years} years...", file=sys.stderr)
+        generate_database(args.generate, args.orders, args.years, args.subscriptions, args.seed)
+        print(f"Wrote {args.generate} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        if args.generate_only:
+            return 0
+        args.db = args.generate
+    if not args.db.exists():
+        print(f"Database not found: {args.db}", file=sys.stderr)
+        return 1
+
+    with tempfile.TemporaryDirectory(prefix="db-bench-") as tmp:
+        conn = copy_database(args.db, Path(tmp) / "bench.db")
+        try:
+            result = {"tables": table_counts(conn), "sqlite": sqlite3.sqlite_version}
+            result.update(advise(conn, args.repeat, args.min_speedup))
+        finally:
+            conn.close()
+
+    print_report(result)
+    if args.output:
+        args.output.write_text(json.dumps(result, indent=2) + "\n")
+        print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
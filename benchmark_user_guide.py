@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Odd Fellow Coffee — User Guide Benchmarks
+=========================================
+Times the three expensive stages of generate_user_guide.py separately:
+- Image encoding (optimize_image on a cold image cache)
+- HTML generation (section markup, img_tag, document_chunks)
+- PDF layout and write (WeasyPrint write_pdf, render cache bypassed)
+
+Each stage also records its peak Python heap (tracemalloc), and every run
+records the output PDF size. Stages run once to warm up and then --repeat
+times; the fastest run is reported, since noise only ever adds time. Runs
+use synthetic guides with 10/100/1000 screenshots so we can see how the
+generator scales past the real guide.
+
+Results are written as JSON. Pass --baseline to compare against a stored
+run; the script exits non-zero when any metric regresses past --threshold
+and by more than its noise floor (NOISE_FLOORS).
+
+Usage:
+    python benchmark_user_guide.py -o bench.json
+    python benchmark_user_guide.py --baseline bench.json --threshold 0.15
+"""
+
+from pathlib import Path
+import argparse
+import itertools
+import json
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from PIL import Image, ImageDraw
+
+import generate_user_guide as guide
+
+BENCH_DIR = guide.CACHE_DIR / "bench"
+DEFAULT_SIZES = (10, 100, 1000)
+SCREENSHOT_SIZE = (1280, 800)
+SCREENSHOTS_PER_SECTION = 10
+METRICS = ("seconds", "peak_bytes")
+DEFAULT_REPEAT = 5
+
+# Differences smaller than these are timer and allocator noise, never a
+# regression, however large they are relative to a fast stage
+NOISE_FLOORS = {"seconds": 0.010, "peak_bytes": 256 * 1024}
+
+
+# =============================================================================
+# SYNTHETIC GUIDES
+# =============================================================================
+
+def synthetic_screenshots(count):
+    """Return paths to count distinct screenshot-like PNGs, creating any missing.
+
+    Each image is unique so the image cache can't short-circuit the encoding
+    stage. They are kept in BENCH_DIR and reused across runs.
+    """
+    BENCH_DIR.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = BENCH_DIR / f"synthetic-{i:04d}.png"
+        if not path.exists():
+            rng = random.Random(i)
+            image = Image.new("RGB", SCREENSHOT_SIZE, "white")
+            draw = ImageDraw.Draw(image)
+            draw.rectangle((0, 0, SCREENSHOT_SIZE[0], 60), fill=guide.COLORS["navy"])
+            for _ in range(40):
+                x, y = rng.randrange(0, SCREENSHOT_SIZE[0] - 200), rng.randrange(80, SCREENSHOT_SIZE[1] - 40)
+                fill = rng.choice(list(guide.COLORS.values()))
+                draw.rectangle((x, y, x + rng.randrange(40, 200), y + rng.randrange(10, 40)), fill=fill)
+                draw.text((x + 4, y + 2), f"Item {i}-{rng.randrange(1000)}", fill="black")
+            image.save(path, "PNG")
+        paths.append(path)
+    return paths
+
+
+def synthetic_sections(paths):
+    """Build guide-style sections, SCREENSHOTS_PER_SECTION screenshots each."""
+    sections = []
+    for start in range(0, len(paths), SCREENSHOTS_PER_SECTION):
+        n = start // SCREENSHOTS_PER_SECTION + 1
+        parts = [f'<div class="page-break" id="bench-{n}">', f"<h1>{n}. Synthetic Section</h1>"]
+        for path in paths[start:start + SCREENSHOTS_PER_SECTION]:
+            parts.append(f"<h2>{path.stem}</h2>")
+            parts.append("<p>" + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 4 + "</p>")
+            parts.append('<div class="tip-box"><b>Tip:</b> Benchmark filler text.</div>')
+            parts.append(guide.img_tag(path.name, "100%"))
+        parts.append("<table><tr><th>Page</th><th>URL</th><th>Who</th></tr>")
+        parts.extend(f"<tr><td>Row {r}</td><td>/bench/{r}</td><td>Admin</td></tr>" for r in range(20))
+        parts.append("</table></div>")
+        sections.append((f"bench-{n}", "\n".join(parts)))
+    return sections
+
+
+# =============================================================================
+# MEASUREMENT
+# =============================================================================
+
+def preload(skip_pdf=False):
+    """Import everything the stages use lazily, so no measured run pays for it.
+
+    Pillow registers its format plugins on first use; WeasyPrint, fonts and
+    the theme stylesheet load on the first render.
+    """
+    Image.init()
+    if not skip_pdf:
+        guide.font_config()
+        guide.theme_stylesheet()
+        guide.local_file_fetcher()
+
+
+def measure(fn, repeat=DEFAULT_REPEAT, setup=None):
+    """Run fn() once to warm up, then repeat times; return (result, metrics).
+
+    metrics holds the fastest run's "seconds" and the smallest "peak_bytes"
+    seen. setup() runs untimed before each call, e.g. to point the stage at
+    a cold cache.
+    """
+    seconds, peaks = [], []
+    for run in range(repeat + 1):
+        if setup is not None:
+            setup()
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            result = fn()
+        finally:
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        if run:  # the first run is the warm-up
+            seconds.append(elapsed)
+            peaks.append(peak)
+    return result, {"seconds": round(min(seconds), 4), "peak_bytes": min(peaks), "runs": repeat}
+
+
+def run_size(count, work_dir, skip_pdf=False, repeat=DEFAULT_REPEAT):
+    """Benchmark one synthetic guide with count screenshots."""
+    paths = synthetic_screenshots(count)
+    guide.SCREENSHOTS_DIR = BENCH_DIR
+    runs = itertools.count()
+
+    def cold_image_cache():
+        # Every encoding run starts from an empty image cache
+        guide.IMAGE_CACHE_DIR = work_dir / f"images-{count}-{next(runs)}"
+
+    result = {}
+    _, result["images"] = measure(lambda: [guide.optimize_image(p) for p in paths], repeat,
+                                  cold_image_cache)
+    html, result["html"] = measure(lambda: list(guide.document_chunks(synthetic_sections(paths))),
+                                   repeat)
+    result["html_bytes"] = sum(len(chunk.encode()) for chunk in html)
+
+    if not skip_pdf:
+        pdf_path = work_dir / f"guide-{count}.pdf"
+        _, result["write_pdf"] = measure(lambda: guide.write_pdf(html, pdf_path), repeat)
+        result["pdf_bytes"] = pdf_path.stat().st_size
+    return result
+
+
+def run_benchmarks(sizes, skip_pdf=False, repeat=DEFAULT_REPEAT):
+    preload(skip_pdf)
+    with tempfile.TemporaryDirectory(prefix="guide-bench-") as tmp:
+        results = {}
+        for count in sizes:
+            print(f"Benchmarking {count} screenshots...", file=sys.stderr)
+            results[str(count)] = run_size(count, Path(tmp), skip_pdf, repeat)
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        max_rss *= 1024
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "weasyprint": guide.weasyprint_version(),
+            "platform": platform.platform(),
+            "max_rss_bytes": max_rss,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+# =============================================================================
+# BASELINE COMPARISON
+# =============================================================================
+
+def compare(current, baseline, threshold):
+    """Return a list of human-readable regressions past threshold (a fraction).
+
+    A metric only regresses when it also grew by more than its NOISE_FLOORS
+    entry; output sizes are deterministic and have no floor.
+    """
+    regressions = []
+    for size, stages in current["results"].items():
+        base_stages = baseline.get("results", {}).get(size)
+        if base_stages is None:
+            continue
+        for stage, values in stages.items():
+            base_values = base_stages.get(stage)
+            if base_values is None:
+                continue
+            if isinstance(values, dict):
+                pairs = [(f"{stage}.{m}", values[m], base_values[m], NOISE_FLOORS[m])
+                         for m in METRICS if m in base_values]
+            else:
+                pairs = [(stage, values, base_values, 0)]
+            for name, now, before, floor in pairs:
+                if before and now > before * (1 + threshold) and now - before > floor:
+                    regressions.append(f"{size} screenshots: {name} {before} -> {now} (+{(now / before - 1):.0%})")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the user guide generator.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="screenshot counts to benchmark (default: 10 100 1000)")
+    parser.add_argument("-o", "--output", type=Path, help="write JSON results here (default: stdout)")
+    parser.add_argument("--baseline", type=Path, help="JSON results from a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown/growth vs the baseline as a fraction (default: 0.2)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, metavar="N",
+                        help=f"timed runs per stage after one warm-up; the fastest is kept "
+                             f"(default: {DEFAULT_REPEAT})")
+    parser.add_argument("--skip-pdf", action="store_true", help="skip the WeasyPrint write_pdf stage")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    current = run_benchmarks(args.sizes, args.skip_pdf, max(args.repeat, 1))
+
+    text = json.dumps(current, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+        print(f"Results saved to: {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.baseline:
+        regressions = compare(current, json.loads(args.baseline.read_text()), args.threshold)
+        if regressions:
+            print("Regressions against baseline:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+        print(f"No regressions past {args.threshold:.0%} against {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
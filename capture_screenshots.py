@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Odd Fellow Coffee — Guide Screenshot Capture
+============================================
+Refreshes guide-screenshots/ from a locally running storefront (SvelteKit,
+port 3200) and admin panel (Express, port 3201) with headless Chromium.
+
+Pages are captured concurrently across several browser contexts. A file is
+only rewritten when the page really changed:
+- If the page's DOM hash matches the last capture and the file is still the
+  one we wrote, no screenshot is taken at all.
+- Otherwise the new screenshot's pixels are hashed and compared to the file
+  on disk; identical pixels leave the file (and its mtime) alone.
+So unchanged screenshots keep their bytes and the guide's render caches stay
+warm.
+
+Requires Playwright (pip install playwright && playwright install chromium).
+Admin pages need ADMIN_USERNAME / ADMIN_PASSWORD in the environment.
+
+Usage:
+    python capture_screenshots.py
+    python capture_screenshots.py --only shop.png admin-orders.png --contexts 2
+"""
+
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import time
+
+import generate_user_guide as guide
+
+SITE_URL = os.environ.get("SITE_URL", "http://localhost:3200")
+ADMIN_URL = os.environ.get("ADMIN_URL", "http://localhost:3201")
+VIEWPORT = {"width": 1440, "height": 900}
+DEFAULT_CONTEXTS = 4
+CAPTURE_STATE_FILE = guide.CACHE_DIR / "screenshots.json"
+
+# filename -> (app, path, full_page). Admin pages other than the login form
+# are captured signed in.
+SHOTS = {
+    "homepage.png": ("site", "/", True),
+    "shop.png": ("site", "/shop", False),
+    "drops-customer.png": ("site", "/drops", False),
+    "admin-login.png": ("admin", "/login", False),
+    "admin-dashboard.png": ("admin", "/", False),
+    "admin-products.png": ("admin", "/products", False),
+    "admin-orders.png": ("admin", "/orders", False),
+    "admin-drops.png": ("admin", "/drops", False),
+    "admin-drops-create.png": ("admin", "/drops/new", True),
+}
+PUBLIC_ADMIN_PATHS = {"/login"}
+
+# Parts of the DOM that change on every load without changing what's shown
+VOLATILE_DOM = [
+    re.compile(r'\sdata-sveltekit-[\w-]+="[^"]*"'),
+    re.compile(r'<script\b[^>]*>.*?</script>', re.S),
+]
+
+
+# =============================================================================
+# CHANGE DETECTION
+# =============================================================================
+
+def referenced_screenshots():
+    """Screenshot file names passed to img_tag() anywhere in guide-templates/."""
+    names = set()
+    for path in guide.TEMPLATES_DIR.rglob("*.html"):
+        names.update(re.findall(r"img_tag\(\s*'([^']+)'", path.read_text()))
+    return names
+
+
+def dom_hash(html):
+    for pattern in VOLATILE_DOM:
+        html = pattern.sub("", html)
+    return hashlib.sha256(html.encode()).hexdigest()
+
+
+def pixel_hash(png_bytes):
+    """Hash of the decoded pixels, so identical images with different PNG
+    encodings compare equal."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(png_bytes)) as image:
+        image = image.convert("RGB")
+        h = hashlib.sha256(f"{image.width}x{image.height}".encode())
+        h.update(image.tobytes())
+    return h.hexdigest()
+
+
+def file_hash(path):
+    return hashlib.sha256(path.read_bytes()).hexdigest() if path.exists() else None
+
+
+def load_state():
+    try:
+        return json.loads(CAPTURE_STATE_FILE.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_state(state):
+    CAPTURE_STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    CAPTURE_STATE_FILE.write_text(json.dumps(state, indent=2, sort_keys=True) + "\n")
+
+
+# =============================================================================
+# CAPTURE
+# =============================================================================
+
+async def admin_storage_state(browser, admin_url, username, password):
+    """Sign in to the admin panel once; the session cookie is shared by every context."""
+    context = await browser.new_context(viewport=VIEWPORT)
+    page = await context.new_page()
+    await page.goto(f"{admin_url}/login")
+    await page.fill("input[name=username]", username)
+    await page.fill("input[name=password]", password)
+    await page.click("button[type=submit]")
+    await page.wait_for_load_state("networkidle")
+    if "/login" in page.url:
+        raise SystemExit("Admin login failed; check ADMIN_USERNAME / ADMIN_PASSWORD.")
+    state = await context.storage_state()
+    await context.close()
+    return state
+
+
+async def capture_one(context, name, url, full_page, state, force):
+    """Capture one page. Returns "skipped", "unchanged" or "updated"."""
+    target = guide.SCREENSHOTS_DIR / name
+    previous = state.get(name, {})
+    page = await context.new_page()
+    try:
+        await page.goto(url, wait_until="networkidle")
+        dom = dom_hash(await page.content())
+        on_disk = file_hash(target)
+        if not force and on_disk and dom == previous.get("dom") and on_disk == previous.get("file"):
+            return "skipped"
+        png = await page.screenshot(full_page=full_page, type="png")
+    finally:
+        await page.close()
+
+    pixels = pixel_hash(png)
+    old_pixels = previous.get("pixels") if on_disk == previous.get("file") else None
+    if on_disk and old_pixels is None:
+        old_pixels = pixel_hash(target.read_bytes())
+    if on_disk and pixels == old_pixels:
+        state[name] = {"dom": dom, "pixels": pixels, "file": on_disk}
+        return "unchanged"
+
+    tmp = target.with_name(target.name + ".tmp")
+    tmp.write_bytes(png)
+    tmp.replace(target)
+    state[name] = {"dom": dom, "pixels": pixels, "file": hashlib.sha256(png).hexdigest()}
+    return "updated"
+
+
+async def capture(names, site_url, admin_url, contexts=DEFAULT_CONTEXTS, force=False):
+    """Capture names concurrently across `contexts` browser contexts; returns {name: outcome}."""
+    try:
+        from playwright.async_api import async_playwright
+    except ImportError:
+        raise SystemExit("Screenshot capture needs Playwright: pip install playwright && playwright install chromium")
+
+    state = load_state()
+    needs_login = any(SHOTS[n][0] == "admin" and SHOTS[n][1] not in PUBLIC_ADMIN_PATHS for n in names)
+    results = {}
+    async with async_playwright() as pw:
+        browser = await pw.chromium.launch()
+        storage = None
+        if needs_login:
+            user, password = os.environ.get("ADMIN_USERNAME", "admin"), os.environ.get("ADMIN_PASSWORD")
+            if not password:
+                raise SystemExit("Set ADMIN_PASSWORD (and ADMIN_USERNAME) to capture admin pages.")
+            storage = await admin_storage_state(browser, admin_url, user, password)
+
+        queue = asyncio.Queue()
+        for name in names:
+            queue.put_nowait(name)
+
+        async def worker():
+            # One context per worker; its pages render in parallel with the others'
+            context = await browser.new_context(viewport=VIEWPORT, device_scale_factor=1,
+                                                storage_state=storage)
+            try:
+                while not queue.empty():
+                    name = queue.get_nowait()
+                    app, path, full_page = SHOTS[name]
+                    url = (site_url if app == "site" else admin_url) + path
+                    try:
+                        results[name] = await capture_one(context, name, url, full_page, state, force)
+                    except Exception as e:
+                        results[name] = f"failed: {e}"
+            finally:
+                await context.close()
+
+        await asyncio.gather(*(worker() for _ in range(max(1, min(contexts, len(names))))))
+        await browser.close()
+    save_state(state)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh guide-screenshots/ from the locally running site.")
+    parser.add_argument("--only", nargs="+", choices=sorted(SHOTS), metavar="FILE",
+                        help="capture just these screenshots")
+    parser.add_argument("--site-url", default=SITE_URL, help=f"storefront base URL (default: {SITE_URL})")
+    parser.add_argument("--admin-url", default=ADMIN_URL, help=f"admin panel base URL (default: {ADMIN_URL})")
+    parser.add_argument("--contexts", type=int, default=DEFAULT_CONTEXTS, metavar="N",
+                        help=f"parallel browser contexts (default: {DEFAULT_CONTEXTS})")
+    parser.add_argument("--force", action="store_true",
+                        help="take every screenshot even if the DOM is unchanged (files are still only "
+                             "rewritten when pixels differ)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    missing = referenced_screenshots() - set(SHOTS)
+    if missing:
+        print(f"Warning: no capture entry for {', '.join(sorted(missing))}", file=sys.stderr)
+    names = args.only or sorted(SHOTS)
+
+    start = time.perf_counter()
+    results = asyncio.run(capture(names, args.site_url.rstrip("/"), args.admin_url.rstrip("/"),
+                                  args.contexts, args.force))
+    for name in names:
+        print(f"  {name:<28} {results.get(name, 'not captured')}")
+    updated = sum(r == "updated" for r in results.values())
+    failed = sum(r.startswith("failed") for r in results.values())
+    print(f"{updated} updated, {len(results) - updated - failed} unchanged, {failed} failed "
+          f"in {time.perf_counter() - start:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Odd Fellow Coffee — Drop Sell-Through Analytics
+===============================================
+Turns the history of sourdough drops into numbers for planning the next one:
+- Sell-through (quantity_sold / quantity_available) per product and drop
+- Time to sell out, from the drop opening to the last order of an item
+- Weekday effects: how each drop day sells relative to the average
+- A recommended quantity_available per product for the next drop
+
+Every drop_item is reduced to one row of aggregates held in NumPy arrays.
+Rows for closed drops never change, so they are kept in AGGREGATES_FILE and
+only new or still-open drops are read from SQLite on later runs. The results
+are rendered as a report page with the user guide's theme.
+
+Usage:
+    python drop_analytics.py                      # report PDF
+    python drop_analytics.py --next-date 2026-11-02 -o plan.pdf
+    python drop_analytics.py --html-only          # browser preview
+"""
+
+from datetime import date, timedelta
+from pathlib import Path
+import argparse
+import json
+import sys
+
+import numpy as np
+
+import generate_user_guide as guide
+
+AGGREGATES_FILE = guide.CACHE_DIR / "drop-aggregates.npz"
+OUTPUT_FILE = guide.PROJECT_DIR / "Odd_Fellow_Coffee_Drop_Report.pdf"
+
+# Drops in these statuses can't sell any more, so their aggregates are final
+FINAL_STATUSES = ("closed",)
+
+RECENT_DROPS = 8        # drops per product that feed a recommendation
+RECENCY_DECAY = 0.8     # weight of each older drop relative to the next newer one
+SOLD_OUT_UPLIFT = 0.25  # extra demand assumed when an item sold out in the first half of its window
+SOLD_OUT_FLOOR = 0.10   # ...and when it sold out later
+WEEKDAY_MIN_DROPS = 3   # drops needed on a weekday before its effect is applied
+
+# One row per drop_item with everything the metrics need; drop_day matches
+# date.toordinal(). The last sale time comes from the drop's orders. created_at
+# is UTC and opens_at local time, so created_at is shifted with 'localtime'.
+AGGREGATE_QUERY = """
+    SELECT di.id, di.drop_id, di.product_id, d.status,
+           CAST(strftime('%w', d.drop_date) AS INTEGER) AS weekday,
+           CAST(julianday(d.drop_date) - julianday('0001-01-01') AS INTEGER) + 1 AS drop_day,
+           di.quantity_available, di.quantity_sold,
+           (julianday(COALESCE(d.closes_at, d.drop_date || ' 23:59')) - julianday(d.opens_at)) * 24 AS window_hours,
+           (SELECT (julianday(MAX(o.created_at), 'localtime') - julianday(d.opens_at)) * 24
+            FROM orders o, json_each(CASE WHEN json_valid(o.items) THEN o.items ELSE '[]' END) j
+            WHERE o.drop_id = d.id AND json_extract(j.value, '$.dropItemId') = di.id) AS last_sale_hours
+    FROM drop_items di JOIN drops d ON d.id = di.drop_id
+    WHERE di.drop_id NOT IN (SELECT value FROM json_each(?))
+    ORDER BY d.drop_date, di.id"""
+
+AGGREGATE_FIELDS = ("drop_item_id", "drop_id", "product_id", "final", "weekday", "drop_day",
+                    "available", "sold", "window_hours", "last_sale_hours")
+
+
+# =============================================================================
+# AGGREGATES — one NumPy row per drop_item, closed drops cached on disk
+# =============================================================================
+
+def empty_aggregates():
+    return {name: np.empty(0, dtype=float if name.endswith("hours") else np.int64) for name in AGGREGATE_FIELDS}
+
+
+def rows_to_aggregates(rows):
+    """Column arrays from AGGREGATE_QUERY rows; NULL hours become NaN."""
+    if not rows:
+        return empty_aggregates()
+    ids, drop_ids, product_ids, statuses, *numeric = zip(*rows)
+    agg = {
+        "drop_item_id": np.array(ids, dtype=np.int64),
+        "drop_id": np.array(drop_ids, dtype=np.int64),
+        "product_id": np.array(product_ids, dtype=np.int64),
+        "final": np.isin(np.array(statuses, dtype=object), FINAL_STATUSES).astype(np.int64),
+    }
+    for name, values in zip(AGGREGATE_FIELDS[4:], numeric):
+        if name.endswith("hours"):
+            agg[name] = np.array([np.nan if v is None else v for v in values], dtype=float)
+        else:
+            agg[name] = np.array([v or 0 for v in values], dtype=np.int64)
+    return agg
+
+
+def concat_aggregates(a, b):
+    return {name: np.concatenate([a[name], b[name]]) for name in AGGREGATE_FIELDS}
+
+
+def load_aggregates(db_path, use_cache=True):
+    """Aggregates for every drop_item: final rows from AGGREGATES_FILE, the rest queried.
+
+    The cache is tied to the database path and rewritten whenever more drops
+    have closed since it was saved.
+    """
+    key = str(Path(db_path).resolve())
+    cached = empty_aggregates()
+    if use_cache and AGGREGATES_FILE.exists():
+        with np.load(AGGREGATES_FILE) as npz:
+            if str(npz["db"]) == key:
+                cached = {name: npz[name] for name in AGGREGATE_FIELDS}
+
+    known = sorted(set(cached["drop_id"].tolist()))
+    conn = guide.connect_readonly(db_path)
+    try:
+        fresh = rows_to_aggregates(conn.execute(AGGREGATE_QUERY, (json.dumps(known),)).fetchall())
+    finally:
+        conn.close()
+    agg = concat_aggregates(cached, fresh)
+
+    if use_cache and fresh["final"].any():
+        final = agg["final"].astype(bool)
+        AGGREGATES_FILE.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(AGGREGATES_FILE, db=np.array(key), **{name: agg[name][final] for name in AGGREGATE_FIELDS})
+    order = np.lexsort((agg["drop_item_id"], agg["drop_day"]))
+    return {name: values[order] for name, values in agg.items()}
+
+
+# =============================================================================
+# METRICS
+# =============================================================================
+
+def sell_through(agg):
+    """quantity_sold / quantity_available per row (NaN when nothing was offered)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(agg["available"] > 0, agg["sold"] / agg["available"], np.nan)
+
+
+def sold_out(agg):
+    return (agg["available"] > 0) & (agg["sold"] >= agg["available"])
+
+
+def hours_to_sell_out(agg):
+    """Hours from opening to the last sale for sold-out rows, NaN otherwise."""
+    return np.where(sold_out(agg), agg["last_sale_hours"], np.nan)
+
+
+def weekday_effects(agg):
+    """Mean sell-through per weekday (Sun..Sat) divided by the overall mean.
+
+    Returns (factors, drop_counts); weekdays with fewer than WEEKDAY_MIN_DROPS
+    drops get a neutral factor of 1.
+    """
+    rate = sell_through(agg)
+    valid = ~np.isnan(rate)
+    totals = np.bincount(agg["weekday"][valid], weights=rate[valid], minlength=7)
+    rows = np.bincount(agg["weekday"][valid], minlength=7)
+    first = np.unique(agg["drop_id"], return_index=True)[1]
+    drops = np.bincount(agg["weekday"][first], minlength=7)
+    overall = rate[valid].mean() if valid.any() else np.nan
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factors = (totals / rows) / overall
+    factors = np.where((drops >= WEEKDAY_MIN_DROPS) & np.isfinite(factors) & (factors > 0), factors, 1.0)
+    return factors, drops
+
+
+def demand_estimate(agg):
+    """Per-row demand: units sold, inflated for rows that sold out.
+
+    A sell-out caps what we observe, so demand is taken as SOLD_OUT_UPLIFT
+    above sales when the item was gone within the first half of the drop
+    window and SOLD_OUT_FLOOR above otherwise.
+    """
+    out = sold_out(agg)
+    early = out & (hours_to_sell_out(agg) < agg["window_hours"] / 2)
+    uplift = np.where(early, SOLD_OUT_UPLIFT, np.where(out, SOLD_OUT_FLOOR, 0.0))
+    return agg["sold"] * (1 + uplift)
+
+
+def recommend(agg, next_weekday):
+    """{product_id: recommendation dict} for a drop on next_weekday (0 = Sunday).
+
+    Each product's last RECENT_DROPS drops are weighted by RECENCY_DECAY per
+    step back in time, scaled by the weekday effect, and rounded up.
+    """
+    factors, _ = weekday_effects(agg)
+    demand = demand_estimate(agg)
+    rate = sell_through(agg)
+    hours = hours_to_sell_out(agg)
+    results = {}
+    for product_id in np.unique(agg["product_id"]):
+        rows = np.flatnonzero(agg["product_id"] == product_id)[-RECENT_DROPS:]
+        weights = RECENCY_DECAY ** np.arange(len(rows))[::-1]
+        # Normalize each drop's demand to an average weekday before averaging
+        base = np.average(demand[rows] / factors[agg["weekday"][rows]], weights=weights)
+        results[int(product_id)] = {
+            "drops": len(rows),
+            "last_available": int(agg["available"][rows[-1]]),
+            "mean_sell_through": float(np.nanmean(rate[rows])) if np.isfinite(rate[rows]).any() else None,
+            "sold_out_drops": int(sold_out(agg)[rows].sum()),
+            "median_sell_out_hours": float(np.nanmedian(hours[rows])) if np.isfinite(hours[rows]).any() else None,
+            "recommended": int(np.ceil(base * factors[next_weekday])),
+        }
+    return results
+
+
+# =============================================================================
+# REPORT
+# =============================================================================
+
+def next_drop_date(agg):
+    """A week after the latest drop, or a week from today without history."""
+    if len(agg["drop_day"]):
+        return date.fromordinal(int(agg["drop_day"].max())) + timedelta(days=7)
+    return guide.build_datetime().date() + timedelta(days=7)
+
+
+def report_html(agg, products, next_date):
+    weekday = (next_date.weekday() + 1) % 7  # Python Monday=0 -> SQLite Sunday=0
+    recommendations = recommend(agg, weekday)
+    factors, drops = weekday_effects(agg)
+    rows = sorted(({"name": products.get(pid, f"Product {pid}"), **rec} for pid, rec in recommendations.items()),
+                  key=lambda r: r["name"])
+    template = guide.template_env().get_template("analytics/drop-report.html")
+    return template.render(
+        next_date=next_date.strftime("%A, %B %d, %Y"),
+        rows=rows,
+        weekdays=[{"name": guide.DAY_NAMES[d], "drops": int(drops[d]), "factor": float(factors[d])}
+                  for d in range(7) if drops[d]],
+        drop_count=len(np.unique(agg["drop_id"])),
+        generated=guide.build_datetime().strftime("%B %d, %Y"),
+        recent_drops=RECENT_DROPS,
+    )
+
+
+def product_names(db_path):
+    conn = guide.connect_readonly(db_path)
+    try:
+        return dict(conn.execute("SELECT id, name FROM products"))
+    finally:
+        conn.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Report drop sell-through and recommend quantities for the next drop.")
+    parser.add_argument("-o", "--output", type=Path, default=OUTPUT_FILE,
+                        help=f"report path (default: {OUTPUT_FILE.name})")
+    parser.add_argument("--db", type=Path, default=guide.DB_PATH,
+                        help="SQLite database (default: $DB_PATH or data/odd-fellow.db)")
+    parser.add_argument("--next-date", type=date.fromisoformat, metavar="YYYY-MM-DD",
+                        help="date of the drop to plan for (default: a week after the latest drop)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="recompute every drop instead of reusing cached aggregates")
+    parser.add_argument("--html-only", action="store_true",
+                        help="write the report as .html next to the PDF path and skip WeasyPrint")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.db.exists():
+        print(f"Database not found: {args.db}", file=sys.stderr)
+        return 1
+    agg = load_aggregates(args.db, use_cache=not args.no_cache)
+    if not len(agg["drop_item_id"]):
+        print("No drops with items yet; nothing to analyze.")
+        return 0
+
+    html = guide.wrap_document(report_html(agg, product_names(args.db), args.next_date or next_drop_date(agg)),
+                               guide.theme_css() if args.html_only else "")
+    if args.html_only:
+        output = args.output.with_suffix(".html")
+        output.write_text(html, encoding="utf-8")
+    else:
+        output = args.output
+        guide.write_pdf(html, output)
+    print(f"Analyzed {len(np.unique(agg['drop_id']))} drops; report saved to: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Odd Fellow Coffee — Pirate Ship CSV Export
+==========================================
+Streams shipped-order rows in the same format as the admin panel's
+"Export CSV" button (admin/lib/csv.js generatePirateshipCSV), for backlogs
+too large to build in memory.
+
+Orders are read from SQLite one row at a time and each row's shipping_address
+and items JSON is parsed as it arrives, so memory stays flat regardless of
+how many orders match. --since (or --watermark) skips orders up to an
+orders.id high-water mark, so repeat runs only read new orders. With
+--status, --watermark also remembers recent orders that haven't reached the
+status yet and re-checks just those by id, so an order confirmed after a
+newer one was exported still goes out once.
+
+Usage:
+    python export_pirateship_csv.py > pirateship.csv
+    python export_pirateship_csv.py --status confirmed -o pirateship.csv
+    python export_pirateship_csv.py --watermark .pirateship-watermark -o new-orders.csv
+"""
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import argparse
+import csv
+import json
+import sqlite3
+import sys
+
+import generate_user_guide as guide
+
+HEADERS = [
+    "Order ID",
+    "Name",
+    "Address Line 1",
+    "Address Line 2",
+    "City",
+    "State",
+    "Zip Code",
+    "Country",
+    "Email",
+    "Phone",
+    "Weight (oz)",
+    "Items",
+    "Order Total",
+]
+
+# Must match VALID_STATUSES in admin/routes/orders.js, in lifecycle order
+VALID_STATUSES = ("pending", "confirmed", "shipped", "delivered")
+OUNCES_PER_ITEM = 8
+
+# An order skipped by --status stays on the watermark's waiting list while
+# its status is earlier in VALID_STATUSES and it is younger than this, the
+# same cutoff idea as the sales summary's open orders. Older ones are dropped,
+# so the list stays small however long the history gets.
+WAITING_SETTLE_DAYS = 60
+
+# Orders past the high-water mark (up to the max id read at the start, so an
+# order inserted mid-run is left for the next one), then the waiting orders
+# re-read by rowid. Waiting ids are all at or below the old mark, so the two
+# halves never return the same order.
+ORDERS_QUERY = """
+    SELECT id, status, created_at, shipping_name, customer_name, customer_email,
+           shipping_address, items, total_cents, shipping_cents
+    FROM orders
+    WHERE id > ? AND id <= ? AND shipping_address IS NOT NULL AND shipping_address != ''
+    UNION ALL
+    SELECT id, status, created_at, shipping_name, customer_name, customer_email,
+           shipping_address, items, total_cents, shipping_cents
+    FROM orders
+    WHERE id IN (SELECT value FROM json_each(?)) AND id <= ?
+      AND shipping_address IS NOT NULL AND shipping_address != ''
+    ORDER BY id"""
+
+
+# =============================================================================
+# ROW FORMATTING — mirrors admin/lib/csv.js
+# =============================================================================
+
+def estimate_weight(items):
+    return sum((item.get("quantity") or 1) * OUNCES_PER_ITEM for item in items) or OUNCES_PER_ITEM
+
+
+def csv_row(order):
+    """One Pirate Ship row for an orders row."""
+    addr = guide.parse_json_column(order["shipping_address"], None)
+    addr = addr if isinstance(addr, dict) else {}
+    items = guide.parse_json_column(order["items"], [])
+    items = [item for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+    summary = "; ".join(f"{item.get('quantity') or 1}x {item.get('name') or 'item'}" for item in items)
+    total_cents = order["total_cents"] + (order["shipping_cents"] or 0)
+    return [
+        order["id"],
+        order["shipping_name"] or order["customer_name"] or "",
+        addr.get("line1") or "",
+        addr.get("line2") or "",
+        addr.get("city") or "",
+        addr.get("state") or "",
+        addr.get("postal_code") or "",
+        "US",
+        order["customer_email"] or "",
+        "",
+        estimate_weight(items),
+        summary,
+        f"{total_cents / 100:.2f}",
+    ]
+
+
+# =============================================================================
+# EXPORT
+# =============================================================================
+
+def stream_orders(conn, since, max_id, waiting=()):
+    """Yield rows with since < id <= max_id, plus the waiting ids, one at a time
+    from the SQLite cursor."""
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    params = (since, max_id, json.dumps(sorted(waiting)), since)
+    yield from cursor.execute(ORDERS_QUERY, params)
+
+
+def may_reach(current, status):
+    """Whether an order in status `current` can still move on to `status`."""
+    if current not in VALID_STATUSES or status not in VALID_STATUSES:
+        return False
+    return VALID_STATUSES.index(current) < VALID_STATUSES.index(status)
+
+
+def export(conn, out, since=0, status=None, waiting=()):
+    """Write the header and every matching row to out.
+
+    Returns (rows, high_water, waiting): the new high-water order id and the
+    skipped orders that may still reach status.
+    """
+    max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM orders").fetchone()[0]
+    settled = datetime.now(timezone.utc) - timedelta(days=WAITING_SETTLE_DAYS)
+    settled = settled.strftime("%Y-%m-%d %H:%M:%S")
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(HEADERS)
+    count, still_waiting = 0, []
+    for order in stream_orders(conn, since, max_id, waiting):
+        if status is None or order["status"] == status:
+            writer.writerow(csv_row(order))
+            count += 1
+        elif may_reach(order["status"], status) and (order["created_at"] or "") >= settled:
+            still_waiting.append(order["id"])
+    return count, max(max_id, since), still_waiting
+
+
+def read_watermark(path):
+    """{"high_water": id, "waiting": [ids]} from path.
+
+    Older watermark files hold a bare order id, or one exported id per line;
+    their largest id becomes the high-water mark.
+    """
+    try:
+        text = path.read_text()
+    except FileNotFoundError:
+        return {"high_water": 0, "waiting": []}
+    try:
+        state = json.loads(text)
+    except json.JSONDecodeError:
+        state = max((int(line) for line in text.split() if line.isdigit()), default=0)
+    if isinstance(state, int):
+        return {"high_water": state, "waiting": []}
+    return {"high_water": int(state.get("high_water", 0)),
+            "waiting": list(state.get("waiting", []))}
+
+
+def write_watermark(path, high_water, waiting):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"high_water": high_water, "waiting": sorted(waiting)}) + "\n")
+    tmp.replace(path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export orders with shipping addresses as a Pirate Ship CSV.")
+    parser.add_argument("-o", "--output", type=Path, help="CSV file to write (default: stdout)")
+    parser.add_argument("--db", type=Path, default=guide.DB_PATH,
+                        help="SQLite database (default: $DB_PATH or data/odd-fellow.db)")
+    parser.add_argument("--status", choices=VALID_STATUSES, help="only export orders with this status")
+    parser.add_argument("--since", type=int, metavar="ORDER_ID",
+                        help="only export orders with a higher id than this")
+    parser.add_argument("--watermark", type=Path, metavar="FILE",
+                        help="read --since from FILE and store the new high-water order id "
+                             "there (with --status, also recent orders still waiting for it)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.db.exists():
+        print(f"Database not found: {args.db}", file=sys.stderr)
+        return 1
+    state = read_watermark(args.watermark) if args.watermark else {"high_water": 0, "waiting": []}
+    since = args.since if args.since is not None else state["high_water"]
+    # A status change can't make an order eligible without --status
+    waiting = state["waiting"] if args.status else []
+
+    conn = guide.connect_readonly(args.db)
+    try:
+        if args.output:
+            with open(args.output, "w", newline="", encoding="utf-8") as out:
+                count, high_water, waiting = export(conn, out, since, args.status, waiting)
+        else:
+            count, high_water, waiting = export(conn, sys.stdout, since, args.status, waiting)
+    finally:
+        conn.close()
+
+    if args.watermark:
+        write_watermark(args.watermark, high_water, waiting)
+    print(f"Exported {count} orders (high-water order id: {high_water}, "
+          f"{len(waiting)} still waiting)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Odd Fellow Coffee — Drop Bake Sheet & Packing Slips
+===================================================
+Prints what the baker needs for one sourdough drop (user guide 4.5):
+- A bake sheet: loaves to bake per product, next to the drop_items counts
+- One packing slip per order, to bag and check off at pickup
+
+The drop, its items and its orders are read from SQLite in a single query.
+Pages use the user guide's theme and templates in guide-templates/fulfillment/.
+Slips are laid out in batches across a process pool and merged in order, so
+a 500-order drop prints in seconds.
+
+Usage:
+    python generate_drop_sheets.py 42
+    python generate_drop_sheets.py 42 --output-dir ~/Desktop -j 8
+"""
+
+from pathlib import Path
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import generate_user_guide as guide
+
+SLIP_BATCH_SIZE = 50
+# "fulfilled" is the admin's paid-and-completed state (VALID_ORDER_STATUSES
+# in src/lib/server/validation.ts)
+PAID_STATUSES = ("confirmed", "fulfilled", "shipped", "delivered")
+
+# drop_items and orders are folded into JSON arrays so one round trip returns
+# everything; orders.items stays a string and is parsed per order like the
+# admin app does, so one malformed cart can't fail the whole query.
+DROP_QUERY = """
+    SELECT d.id, d.title, d.drop_date, d.pickup_start, d.pickup_end, d.status,
+        (SELECT json_group_array(json_object(
+                    'id', di.id, 'product_id', di.product_id, 'name', p.name,
+                    'quantity_available', di.quantity_available, 'quantity_sold', di.quantity_sold))
+         FROM drop_items di JOIN products p ON p.id = di.product_id
+         WHERE di.drop_id = d.id) AS drop_items,
+        (SELECT json_group_array(json_object(
+                    'id', o.id, 'customer_name', o.customer_name, 'customer_email', o.customer_email,
+                    'items', o.items, 'total_cents', o.total_cents, 'status', o.status, 'stage', o.stage))
+         FROM orders o
+         WHERE o.drop_id = d.id AND o.status IN (SELECT value FROM json_each(?))) AS orders
+    FROM drops d
+    WHERE d.id = ?"""
+
+# Slips print on half-letter pages; neither sheet carries the guide's page numbers
+SHEET_CSS = """
+        @page { @bottom-center { content: none; } }
+        @page slip { size: 5.5in 8.5in; margin: 0.4in; }
+
+        .slip {
+            page: slip;
+            page-break-after: always;
+        }
+
+        .slip h2 {
+            margin-top: 0;
+        }
+"""
+
+
+# =============================================================================
+# DROP DATA
+# =============================================================================
+
+def parse_items(items_json):
+    """The item objects in orders.items, or [] when it is missing or malformed.
+
+    Entries that aren't objects are dropped, so one bad cart can't stop a run.
+    """
+    items = guide.parse_json_column(items_json, [])
+    return [item for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+
+
+def load_drop(conn, drop_id, statuses=PAID_STATUSES):
+    """Return (drop, drop_items, orders) for drop_id, or None if there is no such drop."""
+    row = conn.execute(DROP_QUERY, (json.dumps(list(statuses)), drop_id)).fetchone()
+    if row is None:
+        return None
+    drop = dict(zip(("id", "title", "drop_date", "pickup_start", "pickup_end", "status"), row))
+    drop_items = json.loads(row[6])
+    orders = sorted(json.loads(row[7]), key=lambda o: o["id"])
+    for order in orders:
+        order["items"] = parse_items(order["items"])
+    return drop, drop_items, orders
+
+
+def order_lines(order, drop_items):
+    """[{name, variant, quantity, drop_item_id}] for an order, named from drop_items when possible."""
+    by_id = {di["id"]: di for di in drop_items}
+    by_product = {di["product_id"]: di for di in drop_items}
+    lines = []
+    for item in order["items"]:
+        di = by_id.get(item.get("dropItemId")) or by_product.get(item.get("productId"))
+        lines.append({
+            "name": (di or {}).get("name") or item.get("name") or "item",
+            "variant": item.get("variant"),
+            "quantity": item.get("quantity") or 1,
+            "drop_item_id": di["id"] if di else None,
+        })
+    return lines
+
+
+def bake_rows(drop_items, slips):
+    """Loaves to bake per product, summed over every slip's lines."""
+    rows = {di["id"]: {"name": di["name"], "ordered": 0, "sold": di["quantity_sold"],
+                       "available": di["quantity_available"]} for di in drop_items}
+    for _, lines in slips:
+        for line in lines:
+            key = line["drop_item_id"] or ("other", line["name"])
+            row = rows.setdefault(key, {"name": line["name"], "ordered": 0, "sold": None, "available": None})
+            row["ordered"] += line["quantity"]
+    return list(rows.values())
+
+
+# =============================================================================
+# RENDERING
+# =============================================================================
+
+def bake_sheet_html(drop, drop_items, slips):
+    rows = bake_rows(drop_items, slips)
+    template = guide.template_env().get_template("fulfillment/bake-sheet.html")
+    return template.render(
+        drop=drop,
+        rows=rows,
+        total=sum(r["ordered"] for r in rows),
+        order_count=len(slips),
+        mismatched=any(r["sold"] is not None and r["sold"] != r["ordered"] for r in rows),
+        printed=guide.build_datetime().strftime("%B %d, %Y %I:%M %p"),
+    )
+
+
+def slip_sections(drop, slips):
+    """[(section_id, html)] with one packing slip per order."""
+    template = guide.template_env().get_template("fulfillment/packing-slip.html")
+    return [(f"order-{order['id']}", template.render(drop=drop, order=order, lines=lines))
+            for order, lines in slips]
+
+
+def render_batch(html_content, target):
+    """Lay out one batch of slips; runs in a worker process."""
+    guide.write_pdf(html_content, target, SHEET_CSS)
+    return target
+
+
+def render_slips(sections, output_file, jobs=1, batch_size=SLIP_BATCH_SIZE):
+    """Render slips in batches of batch_size across jobs processes, then merge in order."""
+    from pypdf import PdfWriter
+
+    batches = [list(guide.document_chunks(sections[i:i + batch_size]))
+               for i in range(0, len(sections), batch_size)]
+    with tempfile.TemporaryDirectory(prefix="drop-slips-") as tmp:
+        targets = [Path(tmp) / f"batch-{i:04d}.pdf" for i in range(len(batches))]
+        if jobs > 1 and len(batches) > 1:
+            with guide.theme_pool(SHEET_CSS, min(jobs, len(batches))) as pool:
+                paths = list(pool.map(render_batch, batches, targets))
+        else:
+            paths = [render_batch(batch, target) for batch, target in zip(batches, targets)]
+
+        writer = PdfWriter()
+        for path in paths:
+            writer.append(str(path))
+        writer.add_metadata(guide.pdf_info_dates())
+        with open(output_file, "wb") as f:
+            writer.write(f)
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Print the bake sheet and packing slips for a drop.")
+    parser.add_argument("drop_id", type=int, help="drops.id of the drop to print")
+    parser.add_argument("--db", type=Path, default=guide.DB_PATH,
+                        help="SQLite database (default: $DB_PATH or data/odd-fellow.db)")
+    parser.add_argument("--output-dir", type=Path, default=guide.PROJECT_DIR,
+                        help="directory for the two PDFs (default: project root)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, metavar="N",
+                        help="lay out slip batches in N parallel processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=SLIP_BATCH_SIZE, metavar="N",
+                        help=f"orders per laid-out batch (default: {SLIP_BATCH_SIZE})")
+    parser.add_argument("--include-pending", action="store_true",
+                        help="also print orders whose checkout was never paid")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.db.exists():
+        print(f"Database not found: {args.db}", file=sys.stderr)
+        return 1
+    statuses = PAID_STATUSES + ("pending",) if args.include_pending else PAID_STATUSES
+    conn = guide.connect_readonly(args.db)
+    loaded = load_drop(conn, args.drop_id, statuses)
+    conn.close()
+    if loaded is None:
+        print(f"Drop {args.drop_id} not found in {args.db}", file=sys.stderr)
+        return 1
+    drop, drop_items, orders = loaded
+    slips = [(order, order_lines(order, drop_items)) for order in orders]
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    bake_file = args.output_dir / f"drop-{drop['id']}-bake-sheet.pdf"
+    guide.write_pdf(guide.wrap_document(bake_sheet_html(drop, drop_items, slips)), bake_file, SHEET_CSS)
+    print(f"Bake sheet saved to: {bake_file}")
+
+    if not slips:
+        print("No orders for this drop; no packing slips to print.")
+        return 0
+    slips_file = args.output_dir / f"drop-{drop['id']}-packing-slips.pdf"
+    render_slips(slip_sections(drop, slips), slips_file, jobs=args.jobs, batch_size=args.batch_size)
+    print(f"{len(slips)} packing slips saved to: {slips_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
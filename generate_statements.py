@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Odd Fellow Coffee — Subscription Statements
+===========================================
+Renders a statement PDF for every subscriber: their subscriptions (variant,
+price, frequency, next delivery, last fulfilled) and their recent orders.
+
+Subscribers and their orders come from one joined SQLite query that is read
+as a stream. Statements are rendered in batches across a process pool with a
+fixed number of batches in flight, so memory stays bounded however many
+subscribers there are. The guide's theme stylesheet is compiled once before
+the pool forks, and each worker compiles the statement template once and
+reuses it for every customer.
+
+Output is one PDF per customer in a directory, or a single merged PDF.
+
+Usage:
+    python generate_statements.py --output-dir statements/
+    python generate_statements.py --merged statements.pdf --days 30
+"""
+
+from datetime import timedelta
+from itertools import islice
+from pathlib import Path
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+import generate_user_guide as guide
+
+STATEMENT_BATCH_SIZE = 25
+DEFAULT_PERIOD_DAYS = 90
+DEFAULT_STATUSES = ("active",)
+
+# One row per customer: their subscriptions and their orders in the period,
+# each folded into a JSON array. Emails are normalized once per row
+# (email_key, lower-cased and trimmed) and orders are aggregated by that key
+# before the join, so the join is on a plain column SQLite can index and each
+# customer's orders array is built once. created_at is UTC, like the ? bound
+# to it.
+STATEMENT_QUERY = """
+    WITH subs AS (
+        SELECT s.*, lower(trim(s.customer_email)) AS email_key, p.name AS product_name
+        FROM subscriptions s
+        LEFT JOIN products p ON p.id = s.product_id
+        WHERE s.status IN (SELECT value FROM json_each(?)) AND s.customer_email IS NOT NULL
+    ), recent AS (
+        SELECT lower(trim(customer_email)) AS email_key,
+               json_group_array(json_object(
+                   'id', id, 'created_at', created_at, 'items', items,
+                   'total_cents', total_cents, 'status', status)) AS orders
+        FROM orders
+        WHERE created_at >= ? AND lower(trim(customer_email)) IN (SELECT email_key FROM subs)
+        GROUP BY 1
+    )
+    SELECT subs.email_key,
+           json_group_array(json_object(
+               'id', subs.id, 'customer_email', subs.customer_email,
+               'shipping_name', subs.shipping_name, 'product_name', subs.product_name,
+               'variant', subs.variant, 'price_cents', subs.price_cents,
+               'frequency', subs.frequency, 'status', subs.status,
+               'next_delivery_date', subs.next_delivery_date,
+               'last_fulfilled_at', subs.last_fulfilled_at)) AS subscriptions,
+           recent.orders
+    FROM subs
+    LEFT JOIN recent ON recent.email_key = subs.email_key
+    GROUP BY subs.email_key
+    ORDER BY subs.email_key"""
+
+STATEMENT_CSS = """
+        @page { @bottom-center { content: none; } }
+
+        .statement + .statement {
+            page-break-before: always;
+        }
+"""
+
+
+# =============================================================================
+# SUBSCRIBER DATA
+# =============================================================================
+
+def item_summary(items_json):
+    items = guide.parse_json_column(items_json, [])
+    if not isinstance(items, list):
+        return ""
+    return "; ".join(f"{item.get('quantity') or 1}x {item.get('name') or 'item'}"
+                     for item in items if isinstance(item, dict))
+
+
+def customer_key(email_key):
+    """Filesystem- and id-safe form of a normalized (lower-cased, trimmed) email address.
+
+    Characters outside [a-z0-9._-] become "_", so a short hash of the email
+    is appended to keep e.g. a+b@x.com and a_b@x.com from sharing a file.
+    """
+    digest = hashlib.sha256(email_key.encode("utf-8")).hexdigest()[:8]
+    return f"{re.sub(r'[^a-z0-9._-]+', '_', email_key)}-{digest}"
+
+
+def stream_customers(conn, since, statuses=DEFAULT_STATUSES):
+    """Yield one dict per customer: {key, email, name, subscriptions, orders}."""
+    conn.row_factory = sqlite3.Row
+    for row in conn.execute(STATEMENT_QUERY, (json.dumps(list(statuses)), since)):
+        subs = sorted(json.loads(row["subscriptions"]), key=lambda s: s["id"])
+        orders = sorted(json.loads(row["orders"] or "[]"), key=lambda o: o["id"])
+        for order in orders:
+            order["summary"] = item_summary(order.pop("items"))
+        yield {
+            "key": customer_key(row["email_key"]),
+            "email": row["email_key"],
+            "name": next((s["shipping_name"] for s in subs if s["shipping_name"]), ""),
+            "subscriptions": subs,
+            "orders": orders,
+        }
+
+
+# =============================================================================
+# RENDERING
+# =============================================================================
+
+def statement_html(customer, context):
+    template = guide.template_env().get_template("statements/statement.html")
+    return template.render(customer=customer, **context)
+
+
+def render_batch(customers, context, target):
+    """Render a batch of statements; runs in a worker process.
+
+    With target a directory, each customer gets their own PDF there;
+    otherwise the batch is written to target as one document.
+    Returns the number of statements rendered.
+    """
+    if target.is_dir():
+        for customer in customers:
+            html = guide.wrap_document(statement_html(customer, context))
+            guide.write_pdf(html, target / f"statement-{customer['key']}.pdf", STATEMENT_CSS)
+    else:
+        sections = [(c["key"], statement_html(c, context)) for c in customers]
+        guide.write_pdf(list(guide.document_chunks(sections)), target, STATEMENT_CSS)
+    return len(customers)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def render_statements(customers, context, output_dir=None, merged=None, jobs=1,
+                      batch_size=STATEMENT_BATCH_SIZE):
+    """Render every customer's statement into output_dir or one merged PDF.
+
+    At most 2 * jobs batches are queued at a time, so only those customers'
+    rows are held in memory while the query keeps streaming.
+    Returns the number of statements rendered.
+    """
+    from pypdf import PdfWriter
+
+    with tempfile.TemporaryDirectory(prefix="statements-") as tmp, \
+            guide.theme_pool(STATEMENT_CSS, jobs) as pool:
+        pending, parts, count = [], [], 0
+        for i, batch in enumerate(batched(customers, batch_size)):
+            target = output_dir if merged is None else Path(tmp) / f"batch-{i:05d}.pdf"
+            pending.append(pool.submit(render_batch, batch, context, target))
+            parts.append(target)
+            if len(pending) >= 2 * jobs:
+                count += pending.pop(0).result()
+        for future in pending:
+            count += future.result()
+
+        if merged is not None and count:
+            writer = PdfWriter()
+            for part in parts:
+                writer.append(str(part))
+            writer.add_metadata(guide.pdf_info_dates())
+            with open(merged, "wb") as f:
+                writer.write(f)
+    return count
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render subscription statement PDFs for every subscriber.")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("--output-dir", type=Path, default=guide.PROJECT_DIR / "statements",
+                        help="write one statement-<email>-<hash>.pdf per customer here "
+                             "(default: statements/)")
+    output.add_argument("--merged", type=Path, metavar="FILE",
+                        help="write every statement into this one PDF instead")
+    parser.add_argument("--db", type=Path, default=guide.DB_PATH,
+                        help="SQLite database (default: $DB_PATH or data/odd-fellow.db)")
+    parser.add_argument("--days", type=int, default=DEFAULT_PERIOD_DAYS,
+                        help=f"include orders from the last N days (default: {DEFAULT_PERIOD_DAYS})")
+    parser.add_argument("--status", nargs="+", default=list(DEFAULT_STATUSES),
+                        help="subscription statuses to include (default: active)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, metavar="N",
+                        help="render in N parallel processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=STATEMENT_BATCH_SIZE, metavar="N",
+                        help=f"statements per worker task (default: {STATEMENT_BATCH_SIZE})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.db.exists():
+        print(f"Database not found: {args.db}", file=sys.stderr)
+        return 1
+    now = guide.build_datetime()
+    period_start = now - timedelta(days=args.days)
+    since = guide.build_datetime_utc() - timedelta(days=args.days)
+    context = {
+        "statement_date": now.strftime("%B %d, %Y"),
+        "period_start": period_start.strftime("%B %d, %Y"),
+    }
+    if args.merged is None:
+        args.output_dir.mkdir(parents=True, exist_ok=True)
+
+    conn = guide.connect_readonly(args.db)
+    try:
+        customers = stream_customers(conn, since.strftime("%Y-%m-%d %H:%M:%S"), args.status)
+        count = render_statements(customers, context, output_dir=args.output_dir,
+                                  merged=args.merged, jobs=args.jobs, batch_size=args.batch_size)
+    finally:
+        conn.close()
+
+    if not count:
+        print("No subscribers matched; nothing to render.")
+    else:
+        print(f"{count} statements saved to: {args.merged or args.output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,16 +9,91 @@ Generates a multi-page user guide covering:
 
 Style reference: D.A. Carson Bible Study handout template (Georgia serif, navy headers,
 colored info boxes, two-column layout where appropriate).
+
+Section markup lives in guide-templates/ as Jinja2 templates; the stylesheet,
+screenshot handling and rendering pipeline live here. WeasyPrint and Pillow
+are imported only when a PDF is rendered or a screenshot re-encoded, so
+--help and --html-only previews start quickly. Audience-specific
+editions (customer guide, admin manual, drops quick card) are defined in
+guide-templates/variants.json and built together with --variants.
+
+--web writes a static HTML edition of the same sections for phones:
+screenshots become lazy-loaded srcset images at several widths, every asset
+gets a content-hashed name and gzip/brotli copies, and static/guide/ is
+served by the site as-is.
+
+--serve keeps warm render workers behind a small local HTTP (or Unix socket)
+service so other tools, such as the admin panel, can turn HTML, named
+templates or the guide itself into PDFs without paying start-up costs.
+
+Builds are reproducible: with SOURCE_DATE_EPOCH set, the printed date and
+PDF metadata come from it, so unchanged content yields byte-identical files.
 """
 
-from weasyprint import HTML
+import jinja2
+import jinja2.meta
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
+import argparse
 import base64
+import cProfile
+import ctypes
+import ctypes.util
+import hashlib
+import importlib.metadata
+import io
+import json
+import mimetypes
+import mmap
+import multiprocessing
+import os
+import re
+import resource
+import select
+import shutil
+import signal
+import socketserver
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
 
 PROJECT_DIR = Path(__file__).parent
 SCREENSHOTS_DIR = PROJECT_DIR / "guide-screenshots"
 OUTPUT_FILE = PROJECT_DIR / "Odd_Fellow_Coffee_User_Guide.pdf"
+CACHE_DIR = PROJECT_DIR / ".guide-cache"
+CACHE_MAX_BYTES = 200 * 1024 * 1024  # oldest rendered PDFs are evicted past this
+IMAGE_CACHE_DIR = CACHE_DIR / "images"
+SECTION_CACHE_DIR = CACHE_DIR / "sections"
+DATA_CACHE_FILE = CACHE_DIR / "site-data.json"
+DB_PATH = Path(os.environ.get("DB_PATH", PROJECT_DIR / "data" / "odd-fellow.db"))
+TEMPLATES_DIR = PROJECT_DIR / "guide-templates"
+TEMPLATE_CACHE_DIR = CACHE_DIR / "templates"
+
+VARIANTS_FILE = TEMPLATES_DIR / "variants.json"
+WEB_DIR = PROJECT_DIR / "static" / "guide"  # SvelteKit serves static/ at the site root
+GUIDE_SUBTITLE = "Website User Guide & Admin Manual"
+
+# Section templates in guide-templates/sections/, in document order
+GUIDE_SECTIONS = ['cover', 'toc', 'overview', 'customer-pages', 'admin-panel', 'admin-drops-section', 'drops-workflow', 'reference']
+
+# Screenshots are downsampled to the resolution they actually print at.
+# Letter paper minus the 0.6in side margins from @page in generate_css().
+CONTENT_WIDTH_IN = 8.5 - 2 * 0.6
+PRINT_DPI = 150
+JPEG_QUALITY = 85
+PNG_COLORS = 256
 
 # =============================================================================
 # COLOR THEME — Adapted from Bible Study template, using Odd Fellow brand
@@ -43,13 +118,570 @@ COLORS = {
 }
 
 
-def img_tag(filename, max_width="100%"):
-    """Embed a screenshot as base64 inline image."""
+# =============================================================================
+# BUILD PROFILING — per-stage wall time and memory for --profile
+# =============================================================================
+
+def current_rss():
+    """Resident set size in bytes (falls back to peak RSS off Linux)."""
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+
+
+class BuildProfile:
+    """Records nested build stages with wall time, Python heap peak and RSS.
+
+    The module-level PROFILE is a disabled instance whose stage() costs next
+    to nothing; --profile swaps in an enabled one.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.events = []
+        self._stack = []
+        self._origin = time.perf_counter()
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        # tracemalloc has a single peak counter, so fold it into the parent
+        # frame before resetting it for this stage
+        _, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+        tracemalloc.reset_peak()
+        frame = {"peak": tracemalloc.get_traced_memory()[0]}
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            _, peak = tracemalloc.get_traced_memory()
+            self._stack.pop()
+            frame_peak = max(frame["peak"], peak)
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], frame_peak)
+            tracemalloc.reset_peak()
+            self.events.append({
+                "name": name,
+                "depth": len(self._stack),
+                "start": start - self._origin,
+                "seconds": end - start,
+                "py_peak_bytes": frame_peak,
+                "rss_bytes": current_rss(),
+            })
+
+    def report(self):
+        """Return the recorded stages as an indented text table, in start order."""
+        lines = [f"{'Stage':<48} {'Wall (s)':>9} {'Py peak (MB)':>13} {'RSS (MB)':>9}"]
+        for e in sorted(self.events, key=lambda e: e["start"]):
+            name = "  " * e["depth"] + e["name"]
+            lines.append(f"{name:<48} {e['seconds']:>9.3f} "
+                         f"{e['py_peak_bytes'] / 2**20:>13.1f} {e['rss_bytes'] / 2**20:>9.1f}")
+        return "\n".join(lines)
+
+    def write_chrome_trace(self, path):
+        """Write the stages in Chrome trace-event format (chrome://tracing, Perfetto)."""
+        events = [{
+            "name": e["name"],
+            "ph": "X",
+            "ts": round(e["start"] * 1e6),
+            "dur": round(e["seconds"] * 1e6),
+            "pid": os.getpid(),
+            "tid": 0,
+            "args": {"py_peak_bytes": e["py_peak_bytes"], "rss_bytes": e["rss_bytes"]},
+        } for e in self.events]
+        Path(path).write_text(json.dumps({"traceEvents": events}))
+
+
+PROFILE = BuildProfile()
+
+
+# =============================================================================
+# SCREENSHOT OPTIMIZATION — downsample to print size, pick the smaller encoding
+# =============================================================================
+
+MIME_SUFFIXES = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+}
+
+
+def sniff_mime(data):
+    """Detect an image's MIME type from its magic bytes, not its file name."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def target_pixel_width(max_width):
+    """Pixel width a screenshot needs to print sharply at PRINT_DPI."""
+    fraction = float(max_width[:-1]) / 100 if max_width.endswith("%") else 1.0
+    return round(CONTENT_WIDTH_IN * fraction * PRINT_DPI)
+
+
+def encode_image(image):
+    """Encode as JPEG and as a quantized PNG, returning the smaller (data, mime)."""
+    from PIL import Image
+
+    candidates = []
+
+    if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+        rgb = None  # JPEG would flatten the alpha channel
+    else:
+        rgb = image.convert("RGB")
+        buf = io.BytesIO()
+        rgb.save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        candidates.append((buf.getvalue(), "image/jpeg"))
+
+    source = image.convert("RGBA") if rgb is None else rgb
+    method = Image.Quantize.FASTOCTREE if rgb is None else Image.Quantize.MEDIANCUT
+    buf = io.BytesIO()
+    source.quantize(colors=PNG_COLORS, method=method).save(buf, "PNG", optimize=True)
+    candidates.append((buf.getvalue(), "image/png"))
+
+    return min(candidates, key=lambda c: len(c[0]))
+
+
+def optimize_image(path, max_width="100%"):
+    """Return (cached_path, mime) for a screenshot resized to its printed width."""
+    return resized_image(path, target_pixel_width(max_width))
+
+
+def resized_image(path, width_px):
+    """Return (cached_path, mime) for a screenshot scaled down to width_px.
+
+    Results are cached in IMAGE_CACHE_DIR keyed on the source bytes and the
+    output settings, so unchanged screenshots are only processed once.
+    """
+    data = path.read_bytes()
+    h = hashlib.sha256(data)
+    h.update(f"{width_px}:{JPEG_QUALITY}:{PNG_COLORS}".encode())
+    key = h.hexdigest()
+
+    for suffix_mime, suffix in MIME_SUFFIXES.items():
+        cached = IMAGE_CACHE_DIR / f"{key}{suffix}"
+        if cached.exists():
+            return cached, suffix_mime
+
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        if image.width > width_px:
+            height_px = round(image.height * width_px / image.width)
+            image = image.resize((width_px, height_px), Image.Resampling.LANCZOS)
+        optimized, mime = encode_image(image)
+
+    # Never ship something bigger than the original file
+    if len(optimized) >= len(data):
+        optimized, mime = data, sniff_mime(data)
+
+    IMAGE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    cached = IMAGE_CACHE_DIR / f"{key}{MIME_SUFFIXES.get(mime, '.bin')}"
+    cached.write_bytes(optimized)
+    return cached, mime
+
+
+def web_img_tag(path, max_width, assets):
+    """A responsive <img> for the web edition: WEB_IMAGE_WIDTHS renditions in
+    srcset, loaded lazily, each written to assets under a hashed name."""
+    from PIL import Image
+
+    with Image.open(path) as image:  # reads the header only
+        width, height = image.size
+    widths = sorted({min(w, width) for w in WEB_IMAGE_WIDTHS})
+    srcset = []
+    for w in widths:
+        cached, mime = resized_image(path, w)
+        srcset.append((w, assets.add(f"{path.stem}-{w}{MIME_SUFFIXES[mime]}", cached)))
+    src = next((url for w, url in reversed(srcset) if w <= WEB_FALLBACK_WIDTH), srcset[0][1])
+    fraction = float(max_width[:-1]) / 100 if max_width.endswith("%") else 1.0
+    sizes = f"(max-width: {WEB_CONTENT_REM}rem) {fraction * 100:g}vw, {WEB_CONTENT_REM * fraction:g}rem"
+    alt = escape(path.stem.replace("-", " ").capitalize()) + " screenshot"
+    return (f'<img src="{src}" srcset="{", ".join(f"{url} {w}w" for w, url in srcset)}" sizes="{sizes}" '
+            f'width="{width}" height="{height}" alt="{alt}" loading="lazy" decoding="async" '
+            f'style="max-width:{max_width};border:1px solid #ddd;border-radius:6px;margin:6pt 0;" />')
+
+
+def img_tag(filename, max_width="100%", link=False):
+    """Embed a screenshot as an optimized image.
+
+    By default the image is inlined as a base64 data URI. With link=True the
+    tag references the optimized file relative to PROJECT_DIR instead, and
+    WeasyPrint streams it from disk through local_file_fetcher(). For browser
+    previews link may be a directory instead: the tag then points at the
+    original screenshot relative to it and nothing is re-encoded. For the web
+    edition link is its WebAssets and web_img_tag() builds the tag.
+    """
     path = SCREENSHOTS_DIR / filename
     if not path.exists():
         return f'<p style="color:#999;font-style:italic;">[Screenshot: {filename} not found]</p>'
-    data = base64.b64encode(path.read_bytes()).decode()
-    return f'<img src="data:image/png;base64,{data}" style="max-width:{max_width};border:1px solid #ddd;border-radius:6px;margin:6pt 0;" />'
+    if isinstance(link, WebAssets):
+        with PROFILE.stage(f"img_tag {filename}"):
+            return web_img_tag(path, max_width, link)
+    if link and link is not True:
+        src = Path(os.path.relpath(path.resolve(), Path(link).resolve())).as_posix()
+        return f'<img src="{src}" style="max-width:{max_width};border:1px solid #ddd;border-radius:6px;margin:6pt 0;" />'
+    with PROFILE.stage(f"img_tag {filename}"):
+        optimized, mime = optimize_image(path, max_width)
+        if link:
+            src = optimized.relative_to(PROJECT_DIR).as_posix()
+        else:
+            src = f"data:{mime};base64,{base64.b64encode(optimized.read_bytes()).decode()}"
+    return f'<img src="{src}" style="max-width:{max_width};border:1px solid #ddd;border-radius:6px;margin:6pt 0;" />'
+
+
+# Directories documents may read through file: URLs, or None for any URL.
+# Render-service workers set it to SERVE_FETCH_DIRS, since their HTML comes
+# from requests and must not reach other files or the network.
+FETCH_DIRS = None
+
+# Relative URLs in documents and stylesheets resolve against the project root
+BASE_URL = PROJECT_DIR.resolve().as_uri() + "/"
+
+
+class FetchRefused(ValueError):
+    """A document or stylesheet asked for a URL outside FETCH_DIRS."""
+
+
+@lru_cache(maxsize=None)
+def local_file_fetcher():
+    """Return the LocalFileFetcher class, importing WeasyPrint on first use."""
+    from weasyprint.urls import URLFetcher, URLFetcherResponse
+
+    class LocalFileFetcher(URLFetcher):
+        """Serve file: URLs inside PROJECT_DIR from a memory map.
+
+        Image bytes go to WeasyPrint's decoder straight from the page cache
+        instead of being copied into Python strings first. Anything else falls
+        back to the stock fetcher, unless FETCH_DIRS is set: then only data:
+        URLs and files under those directories can be read. WeasyPrint only
+        logs a failed fetch, so refused URLs are also kept in self.refused.
+        """
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.refused = []
+
+        def refuse(self, url, message):
+            self.refused.append(url)
+            raise FetchRefused(message)
+
+        def fetch(self, url, headers=None):
+            if url.startswith("file:"):
+                path = Path(url2pathname(urlsplit(url).path)).resolve()
+                if FETCH_DIRS is not None and not any(
+                        path.is_relative_to(d.resolve()) for d in FETCH_DIRS):
+                    self.refuse(url, f"Reading {path} is not allowed here")
+                if path.is_relative_to(PROJECT_DIR.resolve()) and path.is_file() and path.stat().st_size:
+                    with open(path, "rb") as f:
+                        body = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    mime = sniff_mime(body[:12])
+                    if mime == "application/octet-stream":
+                        mime = mimetypes.guess_type(path.name)[0] or mime
+                    return URLFetcherResponse(url, body, {"Content-Type": mime})
+            elif FETCH_DIRS is not None and not url.startswith("data:"):
+                self.refuse(url, f"Fetching {url} is not allowed here")
+            return super().fetch(url, headers)
+
+    return LocalFileFetcher
+
+
+# =============================================================================
+# SITE DATA — read-only snapshot of the live SQLite database
+# =============================================================================
+
+# One bulk query per table; joins happen in Python on the cached rows.
+SITE_DATA_QUERIES = {
+    "products": """
+        SELECT id, name, category, description, price_cents, variants, subscribable, active
+        FROM products ORDER BY category, name""",
+    "drops": """
+        SELECT id, title, drop_date, opens_at, closes_at, pickup_start, pickup_end, status
+        FROM drops ORDER BY drop_date DESC, id DESC""",
+    "drop_items": """
+        SELECT id, drop_id, product_id, quantity_available, quantity_sold, price_cents_override
+        FROM drop_items ORDER BY drop_id, id""",
+    "time_slots": """
+        SELECT id, day_of_week, start_time, end_time, capacity, active
+        FROM time_slots ORDER BY day_of_week, start_time""",
+}
+
+DAY_NAMES = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]  # JS getDay() order
+
+# Open read-only connections, reused for the life of the process so that
+# PRAGMA data_version can tell us the database is unchanged without a re-query.
+_site_data_state = {}
+
+
+def db_fingerprint(db_path):
+    """Size and mtime of the database and its WAL, which take writes first."""
+    fingerprint = []
+    for path in (db_path, db_path.with_name(db_path.name + "-wal")):
+        try:
+            st = path.stat()
+            fingerprint.append([st.st_size, st.st_mtime_ns])
+        except FileNotFoundError:
+            fingerprint.append(None)
+    return fingerprint
+
+
+def connect_readonly(db_path):
+    """Open db_path read-only; the site and admin app own all writes."""
+    return sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+
+
+def parse_json_column(text, default):
+    """Parse a JSON text column (orders.items, shipping_address), returning
+    default when it is empty or malformed, as the admin app does."""
+    if not text:
+        return default
+    try:
+        return json.loads(text)
+    except ValueError:
+        return default
+
+
+def query_site_data(conn):
+    conn.row_factory = sqlite3.Row
+    return {table: [dict(row) for row in conn.execute(sql)] for table, sql in SITE_DATA_QUERIES.items()}
+
+
+def load_site_data(db_path=DB_PATH, use_cache=True):
+    """Return {table: [row dicts]} for the guide's data-driven sections.
+
+    Returns None when the database does not exist, so the guide falls back to
+    its hand-written text. Within a process the snapshot is reused while
+    PRAGMA data_version is unchanged; across runs it is cached in
+    DATA_CACHE_FILE and invalidated when the database or WAL file changes.
+    """
+    db_path = Path(db_path)
+    if not db_path.exists():
+        return None
+    key = str(db_path.resolve())
+
+    state = _site_data_state.get(key)
+    if state is not None:
+        version = state["conn"].execute("PRAGMA data_version").fetchone()[0]
+        if version == state["version"]:
+            return state["data"]
+
+    fingerprint = db_fingerprint(db_path)
+    data = None
+    if use_cache and state is None and DATA_CACHE_FILE.exists():
+        try:
+            cached = json.loads(DATA_CACHE_FILE.read_text())
+        except ValueError:
+            cached = {}
+        if cached.get("db") == key and cached.get("fingerprint") == fingerprint:
+            data = cached["data"]
+
+    conn = state["conn"] if state else connect_readonly(db_path)
+    version = conn.execute("PRAGMA data_version").fetchone()[0]
+    if data is None:
+        data = query_site_data(conn)
+        if use_cache:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            DATA_CACHE_FILE.write_text(json.dumps({"db": key, "fingerprint": fingerprint, "data": data}))
+    _site_data_state[key] = {"conn": conn, "version": version, "data": data}
+    return data
+
+
+def format_cents(cents):
+    return f"${cents / 100:.2f}"
+
+
+def shop_categories_html(data):
+    """The 2.2 Shop filter list, naming the active products in each category."""
+    if not data:
+        return """<ul>
+        <li><b>All</b> — Shows everything</li>
+        <li><b>Coffee</b> — House Blend, Dark Roast, Decaf Blend</li>
+        <li><b>Bakery</b> — Sourdough Loaf, etc.</li>
+        <li><b>Hotplate</b> — Breakfast items</li>
+    </ul>"""
+    by_category = {}
+    for product in data["products"]:
+        if product["active"]:
+            by_category.setdefault(product["category"], []).append(escape(product["name"]))
+    items = ["<li><b>All</b> — Shows everything</li>"]
+    items += [f"<li><b>{escape(category.title())}</b> — {', '.join(names)}</li>"
+              for category, names in by_category.items()]
+    return "<ul>\n        " + "\n        ".join(items) + "\n    </ul>"
+
+
+def product_catalog_html(data):
+    rows = "".join(
+        f"<tr><td><b>{escape(p['name'])}</b>{'' if p['active'] else ' (inactive)'}</td>"
+        f"<td>{escape(p['category'])}</td><td>{format_cents(p['price_cents'])}</td>"
+        f"<td>{'Yes' if p['subscribable'] else 'No'}</td></tr>"
+        for p in data["products"])
+    return f"""<h2>Product Catalog</h2>
+    <table>
+        <tr><th>Product</th><th>Category</th><th>Price</th><th>Subscribable</th></tr>
+        {rows}
+    </table>"""
+
+
+def time_slot_grid_html(data):
+    """Reservation capacity per time window (rows) and weekday (columns)."""
+    grid = {}
+    for slot in data["time_slots"]:
+        if slot["active"]:
+            window = (slot["start_time"], slot["end_time"])
+            grid.setdefault(window, {})[slot["day_of_week"]] = slot["capacity"]
+    if not grid:
+        return ""
+    header = "".join(f"<th>{day}</th>" for day in DAY_NAMES)
+    rows = "".join(
+        f"<tr><td><b>{escape(start)}–{escape(end)}</b></td>"
+        + "".join(f"<td>{days.get(d, '&mdash;')}</td>" for d in range(7)) + "</tr>"
+        for (start, end), days in sorted(grid.items()))
+    return f"""<h2>Reservation Time Slots</h2>
+    <p>Seats available per slot. Manage these at <b>/admin/slots</b>.</p>
+    <table>
+        <tr><th>Time</th>{header}</tr>
+        {rows}
+    </table>"""
+
+
+def drop_summary_html(data, limit=8):
+    """The most recent drops with per-item sell-through."""
+    if not data["drops"]:
+        return ""
+    names = {p["id"]: p["name"] for p in data["products"]}
+    items_by_drop = {}
+    for item in data["drop_items"]:
+        items_by_drop.setdefault(item["drop_id"], []).append(item)
+    rows = []
+    for drop in data["drops"][:limit]:
+        items = "<br/>".join(
+            f"{escape(names.get(i['product_id'], 'Unknown product'))}: "
+            f"{i['quantity_sold'] or 0}/{i['quantity_available']} sold"
+            for i in items_by_drop.get(drop["id"], []))
+        status = escape(drop["status"] or "scheduled")
+        rows.append(
+            f"<tr><td><b>{escape(drop['title'])}</b></td><td>{escape(drop['drop_date'])}</td>"
+            f'<td><span class="status-badge badge-{status.replace("_", "-")}">{status.replace("_", " ")}</span></td>'
+            f"<td>{items}</td></tr>")
+    return f"""<h2>Recent Drops</h2>
+    <table>
+        <tr><th>Drop</th><th>Date</th><th>Status</th><th>Items</th></tr>
+        {"".join(rows)}
+    </table>"""
+
+
+def site_data_reference_html(data):
+    """Quick Reference tables built from the database, empty without one."""
+    if not data:
+        return ""
+    return "\n\n    ".join(part for part in (
+        product_catalog_html(data),
+        time_slot_grid_html(data),
+        drop_summary_html(data),
+    ) if part)
+
+
+# =============================================================================
+# BUILD DATE — SOURCE_DATE_EPOCH pins every date a build stamps
+# =============================================================================
+
+def source_date_epoch():
+    """SOURCE_DATE_EPOCH as a UTC datetime, or None when unset (or not a number)."""
+    try:
+        return datetime.fromtimestamp(int(os.environ["SOURCE_DATE_EPOCH"]), timezone.utc)
+    except (KeyError, ValueError):
+        return None
+
+
+def build_datetime():
+    """The date builds print on covers, footers and reports.
+
+    With SOURCE_DATE_EPOCH set (https://reproducible-builds.org/specs/source-date-epoch/)
+    this is that instant in UTC, so rebuilding unchanged content produces
+    byte-identical PDFs; otherwise it is the local time now.
+    """
+    epoch = source_date_epoch()
+    return datetime.now() if epoch is None else epoch.replace(tzinfo=None)
+
+
+def build_datetime_utc():
+    """build_datetime() as naive UTC, for comparing with SQLite
+    CURRENT_TIMESTAMP columns such as orders.created_at."""
+    return (source_date_epoch() or datetime.now(timezone.utc)).replace(tzinfo=None)
+
+
+def pdf_info_dates():
+    """/CreationDate and /ModDate for pypdf's add_metadata(), or {} without SOURCE_DATE_EPOCH.
+
+    Unset, no dates are written at all, which keeps the output stable too.
+    """
+    epoch = source_date_epoch()
+    if epoch is None:
+        return {}
+    stamp = epoch.strftime("D:%Y%m%d%H%M%SZ")
+    return {"/CreationDate": stamp, "/ModDate": stamp}
+
+
+# =============================================================================
+# TEMPLATES — Jinja2 section templates with a bytecode cache
+# =============================================================================
+
+@lru_cache(maxsize=None)
+def template_env():
+    """The shared Jinja2 environment for guide-templates/.
+
+    Compiled templates are kept in TEMPLATE_CACHE_DIR so later runs skip
+    parsing; auto_reload picks up edits to the template files. Autoescaping
+    is off because sections splice in HTML from img_tag() and the site-data
+    helpers, which escape database values themselves.
+    """
+    TEMPLATE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(TEMPLATES_DIR),
+        bytecode_cache=jinja2.FileSystemBytecodeCache(str(TEMPLATE_CACHE_DIR)),
+        auto_reload=True,
+        keep_trailing_newline=True,
+    )
+    env.globals.update(
+        COLORS=COLORS,
+        format_cents=format_cents,
+        img_tag=img_tag,
+        shop_categories_html=shop_categories_html,
+        site_data_reference_html=site_data_reference_html,
+    )
+    return env
+
+
+_template_variables = {}
+_section_memo = {}  # section name -> (memo key, rendered html)
+
+
+def template_variables(template):
+    """Names a template reads from its context or globals."""
+    if template not in _template_variables:
+        env = template_env()
+        source, _, _ = env.loader.get_source(env, template.name)
+        _template_variables[template] = jinja2.meta.find_undeclared_variables(env.parse(source))
+    return _template_variables[template]
 
 
 def generate_css():
@@ -288,490 +920,1468 @@ def generate_css():
     """
 
 
-def generate_html():
-    date_str = datetime.now().strftime("%B %d, %Y")
+@lru_cache(maxsize=None)
+def theme_css():
+    """generate_css() output, built once per process."""
+    return generate_css()
 
-    return f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <style>{generate_css()}</style>
-</head>
-<body>
-
-<!-- COVER PAGE -->
-<div class="cover">
-    <h1>Odd Fellow Coffee Roasters</h1>
-    <p class="subtitle">Website User Guide & Admin Manual</p>
-    <p class="date">{date_str}</p>
-    <p style="margin-top:40pt;color:#999;font-size:9pt;">oddfellowcoffee.com</p>
-</div>
-
-<!-- TABLE OF CONTENTS -->
-<div class="page-break">
-    <h1>Table of Contents</h1>
-    <div class="toc">
-        <ul>
-            <li><a href="#overview">1. Site Overview</a></li>
-            <li><a href="#customer-pages">2. Customer Pages</a></li>
-            <li style="padding-left:16pt;"><a href="#homepage">2.1 Homepage</a></li>
-            <li style="padding-left:16pt;"><a href="#shop">2.2 Shop</a></li>
-            <li style="padding-left:16pt;"><a href="#drops-customer">2.3 Drops (Customer View)</a></li>
-            <li style="padding-left:16pt;"><a href="#cart-checkout">2.4 Cart & Checkout</a></li>
-            <li style="padding-left:16pt;"><a href="#subscriptions">2.5 Subscriptions</a></li>
-            <li><a href="#admin-panel">3. Admin Panel</a></li>
-            <li style="padding-left:16pt;"><a href="#admin-login">3.1 Login</a></li>
-            <li style="padding-left:16pt;"><a href="#admin-dashboard">3.2 Dashboard</a></li>
-            <li style="padding-left:16pt;"><a href="#admin-products">3.3 Managing Products</a></li>
-            <li style="padding-left:16pt;"><a href="#admin-orders">3.4 Managing Orders</a></li>
-            <li style="padding-left:16pt;"><a href="#admin-drops-section">3.5 Managing Drops</a></li>
-            <li style="padding-left:16pt;"><a href="#admin-slots">3.6 Time Slots</a></li>
-            <li style="padding-left:16pt;"><a href="#admin-subs">3.7 Subscriptions</a></li>
-            <li><a href="#drops-workflow">4. Sourdough Drops Workflow (Detailed)</a></li>
-            <li style="padding-left:16pt;"><a href="#drops-concept">4.1 What Are Drops?</a></li>
-            <li style="padding-left:16pt;"><a href="#drops-lifecycle">4.2 Drop Lifecycle</a></li>
-            <li style="padding-left:16pt;"><a href="#drops-create">4.3 Creating a Drop (Step-by-Step)</a></li>
-            <li style="padding-left:16pt;"><a href="#drops-orders">4.4 When Customers Order</a></li>
-            <li style="padding-left:16pt;"><a href="#drops-fulfill">4.5 Fulfilling Drop Orders</a></li>
-            <li style="padding-left:16pt;"><a href="#drops-close">4.6 Closing a Drop</a></li>
-            <li><a href="#reference">5. Quick Reference</a></li>
-        </ul>
-    </div>
-</div>
-
-<!-- 1. SITE OVERVIEW -->
-<div class="page-break" id="overview">
-    <h1>1. Site Overview</h1>
-    <p>Odd Fellow Coffee Roasters is a SvelteKit e-commerce website for a specialty coffee and sourdough bakery in Oklahoma. The site supports three sales channels:</p>
-
-    <div class="two-col">
-        <div class="info-box">
-            <b>Regular Shop</b><br/>
-            Browse and purchase coffee, bread, and hot plate items for pickup. Always available.
-        </div>
-        <div class="info-box">
-            <b>Sourdough Drops</b><br/>
-            Limited-inventory bake day pre-orders. Opens on a schedule, sells out fast.
-        </div>
-        <div class="info-box">
-            <b>Subscriptions</b><br/>
-            Weekly, biweekly, or monthly recurring coffee deliveries billed through Stripe.
-        </div>
-        <div class="info-box">
-            <b>Reservations</b><br/>
-            Book a table time slot for dine-in experiences.
-        </div>
-    </div>
-
-    <h3>How Payments Work</h3>
-    <p>All payments are processed through <b>Stripe</b>. When a customer clicks "Add to Cart" and checks out, they are redirected to Stripe's secure checkout page. After payment, Stripe sends a webhook back to the site confirming the order. The admin never handles credit card information directly.</p>
-
-    {img_tag('homepage.png', '100%')}
-</div>
-
-<!-- 2. CUSTOMER PAGES -->
-<div class="page-break" id="customer-pages">
-    <h1>2. Customer Pages</h1>
-
-    <h2 id="homepage">2.1 Homepage</h2>
-    <p>The homepage (<b>/</b>) features:</p>
-    <ul>
-        <li><b>Hero section</b> — Brand name, tagline, and product images</li>
-        <li><b>About section</b> — Story of Caleb & Deborah, accessible via the "About" nav link</li>
-        <li><b>Gallery</b> — Photos of products and the bakery</li>
-        <li><b>Navigation</b> — Links to Shop, Drops, Reservations, Cart, and Contact (footer)</li>
-    </ul>
-
-    <h2 id="shop">2.2 Shop</h2>
-    <p>The shop page (<b>/shop</b>) displays all active products in a card grid. Products are organized by category with filter buttons:</p>
-    <ul>
-        <li><b>All</b> — Shows everything</li>
-        <li><b>Coffee</b> — House Blend, Dark Roast, Decaf Blend</li>
-        <li><b>Bakery</b> — Sourdough Loaf, etc.</li>
-        <li><b>Hotplate</b> — Breakfast items</li>
-    </ul>
 
-    {img_tag('shop.png', '100%')}
+@lru_cache(maxsize=None)
+def font_config():
+    """One FontConfiguration shared by every document rendered in this process,
+    so font discovery for Georgia happens once."""
+    from weasyprint.text.fonts import FontConfiguration
+
+    return FontConfiguration()
+
 
-    <p>Each product card shows the name, description, price, and variant selector (e.g., 8oz/16oz for coffee). Coffee products also have a <b>"Subscribe"</b> button for recurring orders.</p>
+@lru_cache(maxsize=None)
+def theme_stylesheet(extra_css=""):
+    """The theme (COLORS included) compiled to a WeasyPrint CSS object once.
 
-    <div class="tip-box">
-        <b>Tip:</b> Only products marked as "active" in the admin panel appear in the shop. Deactivated products are hidden from customers.
-    </div>
+    Documents rendered to PDF carry no inline <style>; this stylesheet is
+    passed to every render instead, with extra_css for variants such as
+    FRAGMENT_CSS.
+    """
+    from weasyprint import CSS
 
-    <h2 id="drops-customer">2.3 Drops (Customer View)</h2>
-    <p>The drops page (<b>/drops</b>) shows any currently active sourdough drops. When no drops are scheduled, customers see a friendly empty state:</p>
+    with PROFILE.stage("stylesheet compile"):
+        return CSS(string=theme_css() + extra_css, font_config=font_config())
 
-    {img_tag('drops-customer.png', '100%')}
 
-    <p>When a drop is live, each item shows remaining inventory with an "Add to Cart" button. Items with 3 or fewer remaining show the count in red to create urgency. Sold-out items are grayed out.</p>
+def theme_pool(extra_css="", jobs=1, **kwargs):
+    """A ProcessPoolExecutor of `jobs` workers that share theme_stylesheet(extra_css).
 
-    <h2 id="cart-checkout">2.4 Cart & Checkout</h2>
-    <p>The cart (<b>/cart</b>) uses browser localStorage to persist items between visits. Customers can adjust quantities or remove items. Clicking "Checkout" creates a Stripe checkout session and redirects to Stripe's payment page.</p>
-    <ul>
-        <li><b>/checkout/success</b> — Shown after successful payment</li>
-        <li><b>/checkout/cancel</b> — Shown if customer cancels at Stripe</li>
-    </ul>
+    The stylesheet is compiled here, before the workers fork, so each one
+    inherits it parsed instead of compiling its own. kwargs go to the executor.
+    """
+    theme_stylesheet(extra_css)
+    return ProcessPoolExecutor(max_workers=max(jobs, 1), **kwargs)
 
-    <div class="warn-box">
-        <b>Important:</b> For drop items, inventory is atomically decremented when the Stripe checkout session is created (not when added to cart). If a customer abandons checkout, inventory is released when the Stripe session expires via the <code>checkout.session.expired</code> webhook.
-    </div>
 
-    <h2 id="subscriptions">2.5 Subscriptions</h2>
-    <p>The subscriptions page (<b>/subscriptions</b>) allows existing subscribers to manage their recurring orders. Customers access it via an HMAC-signed email link (no password needed). They can view their active subscriptions and cancel if needed.</p>
-</div>
+def data_token(data):
+    """Stable hash of a load_site_data() snapshot, for memo keys."""
+    if data is None:
+        return None
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
 
-<!-- 3. ADMIN PANEL -->
-<div class="page-break" id="admin-panel">
-    <h1>3. Admin Panel</h1>
 
-    <h2 id="admin-login">3.1 Login</h2>
-    <p>Navigate to <b>/admin</b> to access the admin panel. Enter your username and password.</p>
+def screenshots_fingerprint():
+    """Cheap stat-based fingerprint of SCREENSHOTS_DIR for memo keys."""
+    if not SCREENSHOTS_DIR.exists():
+        return ()
+    return tuple((p.name, p.stat().st_size, p.stat().st_mtime_ns)
+                 for p in sorted(SCREENSHOTS_DIR.iterdir()) if p.is_file())
 
-    {img_tag('admin-login.png', '100%')}
 
-    <div class="critical-box">
-        <b>Security:</b> The admin login has rate limiting (5 attempts per 15 minutes). After 5 failed attempts, the account is locked for 15 minutes. Sessions expire automatically, and cookies are scoped to <code>/admin</code> and <code>/api/admin</code> paths only.
-    </div>
+def render_section(name, context, tokens):
+    """Render guide-templates/sections/<name>.html, memoized per section.
 
-    <h2 id="admin-dashboard">3.2 Dashboard</h2>
-    <p>After logging in, you see the dashboard with six sections:</p>
+    The memo key covers the template object (Jinja hands back a new one when
+    the file changes) and the tokens for just the variables the template
+    references, so static sections like the TOC render once per process.
+    Sections that embed screenshots are also keyed on the screenshot files.
+    """
+    env = template_env()
+    template = env.get_template(f"sections/{name}.html")
+    used = template_variables(template)
+    key = (template,) + tuple((k, tokens[k]) for k in sorted(used & tokens.keys()))
+    if "img_tag" in used:
+        key += (screenshots_fingerprint(),)
+
+    memo = _section_memo.get(name)
+    if memo is not None and memo[0] == key:
+        return memo[1]
+    html = template.render(context)
+    _section_memo[name] = (key, html)
+    return html
+
+
+def generate_sections(link_images=False, data=None, variant=None):
+    """Return the guide body as [(section_id, html), ...] in document order.
+
+    Each section is one top-level div and starts on its own page, so sections
+    can be laid out independently and stitched back together. data is the
+    load_site_data() snapshot used for the catalog, slot and drop tables.
+    variant is an entry from variants.json selecting a subset of sections.
+    """
+    names = variant["sections"] if variant else GUIDE_SECTIONS
+    subtitle = variant.get("subtitle", GUIDE_SUBTITLE) if variant else GUIDE_SUBTITLE
+    date_str = build_datetime().strftime("%B %d, %Y")
+    context = {"date_str": date_str, "link_images": link_images, "data": data,
+               "subtitle": subtitle, "sections": names}
+    tokens = {"date_str": date_str, "link_images": link_images, "data": data_token(data),
+              "subtitle": subtitle, "sections": tuple(names)}
+    return [(name, render_section(name, context, tokens)) for name in names]
 
-    {img_tag('admin-dashboard.png', '100%')}
 
-    <table>
-        <tr><th>Section</th><th>Path</th><th>What It Does</th></tr>
-        <tr><td><b>Orders</b></td><td>/admin/orders</td><td>View all orders, update status (pending &rarr; confirmed &rarr; fulfilled), advance drop order stages</td></tr>
-        <tr><td><b>Products</b></td><td>/admin/products</td><td>Add, edit, deactivate products. Set prices, categories, variants, subscribable flag</td></tr>
-        <tr><td><b>Reservations</b></td><td>/admin/reservations</td><td>View all table reservations (read-only)</td></tr>
-        <tr><td><b>Time Slots</b></td><td>/admin/slots</td><td>Add or remove available reservation time slots</td></tr>
-        <tr><td><b>Subscriptions</b></td><td>/admin/subscriptions</td><td>View all active, canceled, and past-due subscriptions (read-only)</td></tr>
-        <tr><td><b>Drops</b></td><td>/admin/drops</td><td>Create and close sourdough drops, track inventory</td></tr>
-    </table>
-
-    <h2 id="admin-products">3.3 Managing Products</h2>
-    <p>The products page lists all products (active and inactive). Each product shows its name, category, price, and status.</p>
-
-    {img_tag('admin-products.png', '100%')}
-
-    <h3>Adding a New Product</h3>
-    <ol>
-        <li>Click <b>"+ New Product"</b></li>
-        <li>Fill in: Name, Category, Description, Price (in cents, e.g., 1400 = $14.00)</li>
-        <li>Optionally set Variants JSON, Image filename, and Subscribable checkbox</li>
-        <li>Click <b>"Save"</b></li>
-    </ol>
-
-    <h3>Editing a Product</h3>
-    <p>Click <b>"Edit"</b> next to any product. The same form appears pre-filled. Change what you need and save.</p>
-
-    <h3>Deactivating a Product</h3>
-    <p>Click <b>"Deactivate"</b> to hide a product from the shop. A confirmation dialog will ask you to confirm. Deactivated products show "(inactive)" in the admin list.</p>
-
-    <div class="tip-box">
-        <b>Tip:</b> Deactivating is not deleting. The product still exists in the database and can be reactivated by editing it and saving.
-    </div>
-
-    <h2 id="admin-orders">3.4 Managing Orders</h2>
-    <p>The orders page shows all orders from newest to oldest. Each order displays the customer name/email, total, and creation date.</p>
-
-    {img_tag('admin-orders.png', '90%')}
-
-    <h3>Order Status Flow (Regular Orders)</h3>
-    <div class="step">
-        <span class="status-badge badge-pending">pending</span> &rarr;
-        <span class="status-badge badge-confirmed">confirmed</span> &rarr;
-        <span class="status-badge badge-fulfilled">fulfilled</span>
-    </div>
-    <p>Click <b>"Confirm"</b> to acknowledge an order, then <b>"Fulfill"</b> when it's been picked up or delivered.</p>
-
-    <h3>Drop Order Stage Flow</h3>
-    <p>Orders from drops have an additional stage tracker:</p>
-    <div class="step">
-        <span class="status-badge badge-confirmed">ordered</span> &rarr;
-        <span class="status-badge badge-pending">baking</span> &rarr;
-        <span class="status-badge badge-live">ready</span> &rarr;
-        <span class="status-badge badge-closed">picked up</span>
-    </div>
-    <p>Click the <b>"&rarr; next stage"</b> button to advance each order through the workflow.</p>
-</div>
-
-<!-- 3.5 MANAGING DROPS (ADMIN) -->
-<div class="page-break" id="admin-drops-section">
-    <h2>3.5 Managing Drops</h2>
-    <p>The drops admin page is where you create and manage bake day drops.</p>
-
-    {img_tag('admin-drops.png', '100%')}
-
-    <p>Each drop card shows:</p>
-    <ul>
-        <li><b>Title</b> and <b>date</b></li>
-        <li><b>Status badge</b> — <span class="status-badge badge-scheduled">scheduled</span> <span class="status-badge badge-live">live</span> <span class="status-badge badge-sold-out">sold out</span> <span class="status-badge badge-closed">closed</span></li>
-        <li><b>Item inventory</b> — "X/Y sold" for each product in the drop</li>
-        <li><b>Close button</b> — Manually close a drop when finished</li>
-    </ul>
-
-    <h3>Creating a New Drop</h3>
-    <p>Click <b>"New Drop"</b> to expand the creation form:</p>
-
-    {img_tag('admin-drops-create.png', '100%')}
-
-    <p>Details on each field and the full creation workflow are in <b>Section 4: Sourdough Drops Workflow</b>.</p>
-
-    <h2 id="admin-slots">3.6 Time Slots</h2>
-    <p>Time slots control when customers can book reservations. Click <b>"+ Add Slot"</b> and fill in:</p>
-    <ul>
-        <li><b>Day of week</b> — Sun through Sat</li>
-        <li><b>Start / End time</b> — e.g., 07:00 to 08:00</li>
-        <li><b>Capacity</b> — How many reservations per slot</li>
-    </ul>
-    <p>Click <b>"Remove"</b> (with confirmation) to delete a slot.</p>
-
-    <h2 id="admin-subs">3.7 Subscriptions</h2>
-    <p>The subscriptions page is read-only. It shows all subscriptions with:</p>
-    <ul>
-        <li>Product name and customer email</li>
-        <li>Frequency (weekly / biweekly / monthly)</li>
-        <li>Status badge (<span class="status-badge badge-live">active</span>, <span class="status-badge badge-sold-out">canceled</span>, <span class="status-badge badge-pending">past due</span>)</li>
-        <li>Current period end date</li>
-        <li>"Canceling" flag if the customer has scheduled a cancellation</li>
-    </ul>
-
-    <div class="info-box">
-        <b>Note:</b> Subscription management (cancellation, plan changes) happens through Stripe. Customers can self-cancel via their HMAC-signed link at <b>/subscriptions</b>.
-    </div>
-</div>
-
-<!-- 4. SOURDOUGH DROPS WORKFLOW -->
-<div class="page-break" id="drops-workflow">
-    <h1>4. Sourdough Drops Workflow</h1>
-
-    <h2 id="drops-concept">4.1 What Are Drops?</h2>
-    <p>A "drop" is a <b>limited-inventory bake day sale</b>. Think of it like a sneaker drop: you announce a date, open pre-orders for a limited time, customers grab what they want before it sells out, then you bake and they pick up.</p>
-
-    <div class="info-box">
-        <b>Example:</b> Every Monday, Deborah bakes 20 loaves of sourdough. On Sunday evening, you create a drop that opens at 6 PM. By Monday morning, 18 of the 20 loaves are claimed. You bake exactly what was ordered, and customers pick up Monday afternoon.
-    </div>
-
-    <h3>Why Drops Instead of Regular Shop Items?</h3>
-    <ul>
-        <li><b>Inventory control</b> — You set exactly how many are available. No overbaking, no waste.</li>
-        <li><b>Urgency</b> — "Only 3 left!" drives customers to order quickly</li>
-        <li><b>Scheduling</b> — Drops auto-open and close on your timeline</li>
-        <li><b>Tracking</b> — Each order from a drop is linked to it, with stage tracking (ordered &rarr; baking &rarr; ready &rarr; picked up)</li>
-    </ul>
-
-    <h2 id="drops-lifecycle">4.2 Drop Lifecycle</h2>
-
-    <div class="step">
-        <span class="step-num">The Four Statuses of a Drop:</span>
-    </div>
+def load_variants(path=VARIANTS_FILE):
+    """Read the audience variant manifest: {name: {title, subtitle, output, sections}}."""
+    return json.loads(Path(path).read_text())
 
-    <table>
-        <tr><th>Status</th><th>What It Means</th><th>Customer Can Order?</th></tr>
-        <tr>
-            <td><span class="status-badge badge-scheduled">scheduled</span></td>
-            <td>Drop has been created but hasn't opened yet. Customers see it listed but cannot buy.</td>
-            <td>No</td>
-        </tr>
-        <tr>
-            <td><span class="status-badge badge-live">live</span></td>
-            <td>Drop is open for orders. The "Opens At" time has passed. Customers can add items to cart and checkout.</td>
-            <td>Yes</td>
-        </tr>
-        <tr>
-            <td><span class="status-badge badge-sold-out">sold out</span></td>
-            <td>All items in the drop have sold out. Happens automatically when the last item is purchased.</td>
-            <td>No</td>
-        </tr>
-        <tr>
-            <td><span class="status-badge badge-closed">closed</span></td>
-            <td>Drop is manually closed by admin. No more orders. This is final.</td>
-            <td>No</td>
-        </tr>
-    </table>
-
-    <div class="flow-arrow">
-        scheduled &rarr; live &rarr; sold out / closed
-    </div>
-
-    <h2 id="drops-create">4.3 Creating a Drop (Step-by-Step)</h2>
-
-    <div class="step">
-        <span class="step-num">Step 1: Go to Admin &rarr; Drops</span><br/>
-        Navigate to <b>/admin/drops</b> and click the <b>"New Drop"</b> button.
-    </div>
-
-    <div class="step">
-        <span class="step-num">Step 2: Fill in the Drop Details</span><br/>
-        <table>
-            <tr><th>Field</th><th>Required?</th><th>Description</th></tr>
-            <tr><td><b>Title</b></td><td>Yes</td><td>Name shown to customers, e.g., "Saturday Sourdough Bake"</td></tr>
-            <tr><td><b>Drop Date</b></td><td>Yes</td><td>The actual date of the bake/sale, e.g., 2026-02-08</td></tr>
-            <tr><td><b>Opens At</b></td><td>Yes</td><td>When customers can start ordering, e.g., Friday at 6 PM the day before</td></tr>
-            <tr><td><b>Closes At</b></td><td>Optional</td><td>Auto-close time. If blank, stays open until sold out or manually closed.</td></tr>
-            <tr><td><b>Pickup Start</b></td><td>Optional</td><td>When customers can pick up, e.g., Saturday 9 AM. Shown on customer page.</td></tr>
-            <tr><td><b>Pickup End</b></td><td>Optional</td><td>End of pickup window, e.g., Saturday 12 PM</td></tr>
-        </table>
-    </div>
-
-    <div class="step">
-        <span class="step-num">Step 3: Add Items to the Drop</span><br/>
-        <p>For each item in the drop:</p>
-        <ol>
-            <li>Select a <b>product</b> from the dropdown (these come from your product catalog)</li>
-            <li>Set the <b>quantity available</b> (how many you'll bake)</li>
-            <li>Optionally set a <b>$ override</b> price (if the drop price differs from the catalog price)</li>
-            <li>Click <b>"+ Add item"</b> to add more products to the same drop</li>
-        </ol>
-    </div>
-
-    <div class="step">
-        <span class="step-num">Step 4: Click "Create Drop"</span><br/>
-        The drop is created with status <span class="status-badge badge-scheduled">scheduled</span>. It will automatically become <span class="status-badge badge-live">live</span> when the "Opens At" time arrives.
-    </div>
-
-    <div class="warn-box">
-        <b>Validation:</b> The form requires a title, drop date, opens-at time, and at least one item. You'll see an error toast if any of these are missing.
-    </div>
-
-    <h2 id="drops-orders">4.4 When Customers Order from a Drop</h2>
-
-    <p>Here's what happens behind the scenes when a customer orders a drop item:</p>
-
-    <div class="step">
-        <span class="step-num">1. Customer adds item to cart</span><br/>
-        The drop item is added to localStorage cart with the <code>dropId</code> and <code>dropItemId</code> attached. Inventory is NOT yet decremented.
-    </div>
-
-    <div class="step">
-        <span class="step-num">2. Customer clicks "Checkout"</span><br/>
-        The checkout API creates a Stripe session. At this moment, inventory is <b>atomically decremented</b> in the database. The <code>quantity_sold</code> on the drop item goes up by the order quantity.
-    </div>
-
-    <div class="step">
-        <span class="step-num">3a. Customer completes payment</span><br/>
-        Stripe sends a <code>checkout.session.completed</code> webhook. The order status is set to <b>"confirmed"</b> and the stage is set to <b>"ordered"</b>. A confirmation email is sent.
-    </div>
-
-    <div class="step">
-        <span class="step-num">3b. Customer abandons checkout</span><br/>
-        If the Stripe session expires (after ~24h), a <code>checkout.session.expired</code> webhook fires. The system <b>releases the inventory</b> back to the drop by decrementing <code>quantity_sold</code>.
-    </div>
-
-    <div class="critical-box">
-        <b>Key Concept — Atomic Inventory:</b> Inventory is reserved at checkout creation, not at cart-add time. This means two customers can both add the last loaf to their cart, but only the first one to click "Checkout" gets it. The second customer will see a "sold out" error. Abandoned checkouts automatically release inventory.
-    </div>
-
-    <h2 id="drops-fulfill">4.5 Fulfilling Drop Orders</h2>
-
-    <p>After customers have ordered and you've baked, use the <b>Orders</b> page to track each order through the fulfillment stages:</p>
-
-    <div class="step">
-        <span class="step-num">ordered</span> &mdash; Customer has paid. This is the initial stage.<br/>
-        <span class="step-num">baking</span> &mdash; Click "&rarr; baking" when you start baking their order.<br/>
-        <span class="step-num">ready</span> &mdash; Click "&rarr; ready" when it's done and waiting for pickup.<br/>
-        <span class="step-num">picked up</span> &mdash; Click "&rarr; picked up" when the customer collects their order.
-    </div>
-
-    <p>Drop orders are identifiable in the orders list by the <span style="color:{COLORS['brand']};font-weight:bold;">(Drop #N)</span> tag next to the order number.</p>
-
-    <h2 id="drops-close">4.6 Closing a Drop</h2>
-
-    <p>When the bake day is over:</p>
-    <ol>
-        <li>Go to <b>/admin/drops</b></li>
-        <li>Click <b>"Close"</b> next to the drop</li>
-        <li>Confirm in the dialog</li>
-    </ol>
-    <p>The status changes to <span class="status-badge badge-closed">closed</span> and the drop disappears from the customer-facing page. This cannot be undone.</p>
-
-    <div class="tip-box">
-        <b>Tip:</b> You don't have to manually close a drop. If it sells out, it automatically shows as <span class="status-badge badge-sold-out">sold out</span>. But closing is good practice to keep the drops page clean for customers.
-    </div>
-</div>
-
-<!-- 5. QUICK REFERENCE -->
-<div class="page-break" id="reference">
-    <h1>5. Quick Reference</h1>
-
-    <h2>URL Reference</h2>
-    <table>
-        <tr><th>Page</th><th>URL</th><th>Who</th></tr>
-        <tr><td>Homepage</td><td>/</td><td>Customer</td></tr>
-        <tr><td>Shop</td><td>/shop</td><td>Customer</td></tr>
-        <tr><td>Drops</td><td>/drops</td><td>Customer</td></tr>
-        <tr><td>Cart</td><td>/cart</td><td>Customer</td></tr>
-        <tr><td>Reservations</td><td>/reservations</td><td>Customer</td></tr>
-        <tr><td>Subscriptions</td><td>/subscriptions</td><td>Customer</td></tr>
-        <tr><td>Admin Login</td><td>/admin</td><td>Admin</td></tr>
-        <tr><td>Orders</td><td>/admin/orders</td><td>Admin</td></tr>
-        <tr><td>Products</td><td>/admin/products</td><td>Admin</td></tr>
-        <tr><td>Reservations</td><td>/admin/reservations</td><td>Admin</td></tr>
-        <tr><td>Time Slots</td><td>/admin/slots</td><td>Admin</td></tr>
-        <tr><td>Subscriptions</td><td>/admin/subscriptions</td><td>Admin</td></tr>
-        <tr><td>Drops</td><td>/admin/drops</td><td>Admin</td></tr>
-    </table>
-
-    <h2>Weekly Workflow Checklist</h2>
-    <div class="step">
-        <span class="step-num">Sunday Evening</span><br/>
-        <ul>
-            <li>Go to /admin/drops &rarr; "New Drop"</li>
-            <li>Set title, Monday's date, opens-at (Sunday 6 PM), pickup window</li>
-            <li>Add items: Sourdough Loaf x 20 (or whatever you're baking)</li>
-            <li>Click "Create Drop"</li>
-        </ul>
-    </div>
-    <div class="step">
-        <span class="step-num">Sunday 6 PM</span><br/>
-        Drop goes live automatically. Customers start ordering.
-    </div>
-    <div class="step">
-        <span class="step-num">Monday Morning</span><br/>
-        <ul>
-            <li>Check /admin/orders for drop orders</li>
-            <li>Advance stages: ordered &rarr; baking</li>
-            <li>Bake what was ordered</li>
-        </ul>
-    </div>
-    <div class="step">
-        <span class="step-num">Monday Afternoon</span><br/>
-        <ul>
-            <li>Advance stages: baking &rarr; ready</li>
-            <li>Customers pick up, advance to: picked up</li>
-            <li>Close the drop when done</li>
-        </ul>
-    </div>
-
-    <h2>Status Colors at a Glance</h2>
-    <div class="two-col">
-        <p><b>Order Status:</b><br/>
-            <span class="status-badge badge-pending">pending</span> Payment not confirmed<br/>
-            <span class="status-badge badge-confirmed">confirmed</span> Payment received<br/>
-            <span class="status-badge badge-fulfilled">fulfilled</span> Order complete
-        </p>
-        <p><b>Drop Status:</b><br/>
-            <span class="status-badge badge-scheduled">scheduled</span> Not yet open<br/>
-            <span class="status-badge badge-live">live</span> Accepting orders<br/>
-            <span class="status-badge badge-sold-out">sold out</span> All items claimed<br/>
-            <span class="status-badge badge-closed">closed</span> Manually closed
-        </p>
-    </div>
-
-    <div class="footer">
-        Odd Fellow Coffee Roasters &mdash; User Guide &mdash; Generated {date_str} &mdash; oddfellowcoffee.com
-    </div>
-</div>
-
-</body>
-</html>
+
+def document_chunks(sections, css="", title=None):
+    """Yield the full document as string chunks, one section at a time.
+
+    The shell comes from guide-templates/document.html; nothing here joins
+    the sections into a single string. css is inlined as a <style> block when
+    given; PDF renders leave it empty and use theme_stylesheet() instead.
+    A title marks a web page and adds it with a mobile viewport.
+    """
+    template = template_env().get_template("document.html")
+    return template.generate(css=css, title=title, body=(html for _, html in sections))
+
+
+def wrap_document(body, css=""):
+    """Wrap body HTML in the guide's document shell."""
+    return "".join(document_chunks([("body", body)], css))
+
+
+def generate_html(link_images=False, data=None):
+    """The whole guide as one standalone HTML string with the theme inlined."""
+    return "".join(document_chunks(generate_sections(link_images, data), theme_css()))
+
+
+def write_html(sections, target):
+    """Stream a standalone HTML preview of sections to target, theme inlined."""
+    with open(target, "w", encoding="utf-8") as f:
+        f.writelines(document_chunks(sections, theme_css()))
+
+
+# =============================================================================
+# RENDER CACHE — content-addressed, skips WeasyPrint when nothing changed
+# =============================================================================
+
+def as_chunks(html_content):
+    """Accept either one HTML string or a sequence of string chunks."""
+    return [html_content] if isinstance(html_content, str) else html_content
+
+
+class ChunkReader(io.RawIOBase):
+    """Binary file object over string chunks, so WeasyPrint can read the
+    document without it ever being joined into one string."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks).encode()
+            except StopIteration:
+                return 0
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+
+@lru_cache(maxsize=None)
+def weasyprint_version():
+    """Installed WeasyPrint version, read from package metadata without importing it."""
+    return importlib.metadata.version("weasyprint")
+
+
+def cache_key(html_content, css="", options=(), screenshots=True):
+    """Hash the rendered HTML/CSS, the WeasyPrint version, any output options
+    that change the written bytes and, with screenshots=True, every screenshot.
+
+    Fragment keys pass screenshots=False: their HTML already identifies its
+    images (inline data URIs carry the bytes, linked files are named by a
+    hash of the source), so editing one screenshot leaves fragments without
+    it cached.
+    """
+    h = hashlib.sha256()
+    h.update(weasyprint_version().encode())
+    h.update(repr(options).encode())
+    h.update(css.encode())
+    for chunk in as_chunks(html_content):
+        h.update(chunk.encode())
+    if screenshots and SCREENSHOTS_DIR.exists():
+        for path in sorted(SCREENSHOTS_DIR.iterdir()):
+            if path.is_file():
+                h.update(path.name.encode())
+                h.update(hashlib.sha256(path.read_bytes()).digest())
+    return h.hexdigest()
+
+
+def cache_lookup(key, cache_dir=CACHE_DIR):
+    """Return the cached PDF path for key, or None on a miss."""
+    path = cache_dir / f"{key}.pdf"
+    try:
+        os.utime(path)  # mark as recently used for eviction
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def unique_temp(directory, prefix):
+    """A new empty temp file in directory, so concurrent writers of the same
+    cache entry never share one before their atomic replace()."""
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f"{prefix}.", suffix=".tmp", dir=directory)
+    os.close(fd)
+    return Path(tmp)
+
+
+def cache_store(key, pdf_path, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """Copy a freshly rendered PDF into the cache, then evict the oldest entries."""
+    tmp = unique_temp(cache_dir, key)
+    try:
+        shutil.copyfile(pdf_path, tmp)
+        tmp.replace(cache_dir / f"{key}.pdf")
+    finally:
+        tmp.unlink(missing_ok=True)
+    evict_cache(cache_dir, max_bytes)
+
+
+def evict_cache(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """Delete least-recently-used entries until the cache fits in max_bytes.
+
+    Other processes (render service workers, --jobs pools) may evict the same
+    entries at the same time, so files that vanish meanwhile are skipped.
+    """
+    entries = []
+    for path in cache_dir.glob("*.pdf"):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    while entries and total > max_bytes:
+        _, size, oldest = entries.pop(0)
+        total -= size
+        oldest.unlink(missing_ok=True)
+
+
+def render_html(html_content):
+    """Wrap html_content for WeasyPrint, resolving relative links against PROJECT_DIR.
+
+    html_content may be a string or a sequence of chunks from document_chunks(),
+    which is streamed to the parser.
+    """
+    from weasyprint import HTML
+
+    fetcher = local_file_fetcher()()
+    if isinstance(html_content, str):
+        return HTML(string=html_content, base_url=BASE_URL, url_fetcher=fetcher)
+    stream = io.BufferedReader(ChunkReader(html_content))
+    return HTML(file_obj=stream, encoding="utf-8", base_url=BASE_URL, url_fetcher=fetcher)
+
+
+def write_pdf(html_content, target, extra_css="", user_css=""):
+    """Parse, lay out and write html_content to target (a path or binary file
+    object) as separate profiled stages.
+
+    The compiled theme_stylesheet(extra_css) and shared font_config() are
+    reused across calls, so extra_css should be one of the module's fixed
+    stylesheets. user_css, such as CSS sent to the render service, is
+    compiled for this call only and applied after the theme, through the same
+    fetcher as the document; FetchRefused is raised if its @imports or
+    @font-face sources reach outside FETCH_DIRS. Dates in the PDF metadata
+    follow SOURCE_DATE_EPOCH; they are not part of the HTML, so render_pdf()
+    adds them to its cache key.
+    """
+    with PROFILE.stage("weasyprint parse"):
+        html = render_html(html_content)
+    stylesheets = [theme_stylesheet(extra_css)]
+    if user_css:
+        from weasyprint import CSS
+
+        fetcher = local_file_fetcher()()
+        stylesheets.append(CSS(string=user_css, base_url=BASE_URL, url_fetcher=fetcher,
+                               font_config=font_config()))
+        if fetcher.refused:
+            raise FetchRefused(f"css may not load {', '.join(fetcher.refused)}")
+    with PROFILE.stage("weasyprint layout"):
+        document = html.render(stylesheets=stylesheets, font_config=font_config())
+    epoch = source_date_epoch()
+    if epoch is not None:
+        document.metadata.created = document.metadata.modified = epoch.strftime("%Y-%m-%dT%H:%M:%SZ")
+    with PROFILE.stage("pdf write"):
+        # Embed only the glyphs used, without hinting instructions
+        document.write_pdf(target if hasattr(target, "write") else str(target),
+                           full_fonts=False, hinting=False)
+
+
+def render_pdf(html_content, output_file, use_cache=True, sections=None, jobs=1,
+               compact=True, linearize=False, extra_fragments=(), max_rss_mb=None):
+    """Write the PDF for html_content (a string or chunk list), reusing a
+    cached render when possible.
+
+    When sections is given, a cache miss is rendered section by section via
+    render_sections() instead of laying out the whole document at once, using
+    up to jobs worker processes. Fresh renders are shrunk with compact_pdf()
+    before they are cached, so cache hits are already compact.
+    extra_fragments are passed on to render_sections(); their content-addressed
+    file names are part of the cache key, as are the SOURCE_DATE_EPOCH dates
+    written into the PDF metadata. With max_rss_mb, stitching and compaction
+    run under that cap too (see run_capped()).
+    Returns True on a cache hit, False when WeasyPrint had to run.
+    """
+    extra = tuple(Path(path).name for path, _ in extra_fragments)
+    dates = tuple(sorted(pdf_info_dates().items()))
+    key = cache_key(html_content, theme_css(), options=(compact, linearize, extra, dates))
+    if use_cache:
+        cached = cache_lookup(key)
+        if cached is not None:
+            try:
+                shutil.copyfile(cached, output_file)
+                return True
+            except FileNotFoundError:
+                pass  # evicted by another process just now; render it again
+    try:
+        if sections is None:
+            write_pdf(html_content, output_file)
+        else:
+            render_sections(sections, output_file, use_cache=use_cache, jobs=jobs,
+                            extra_fragments=extra_fragments, max_rss_mb=max_rss_mb)
+        if compact:
+            before, after = run_capped(max_rss_mb, compact_pdf, output_file, linearize)
+    except SystemExit:
+        # Over --max-rss: don't leave a half-finished PDF behind
+        Path(output_file).unlink(missing_ok=True)
+        raise
+    if compact:
+        print(f"PDF size: {before / 2**20:.2f} MB -> {after / 2**20:.2f} MB "
+              f"({(after - before) / before:+.0%})")
+    if use_cache:
+        cache_store(key, output_file)
+    return False
+
+
+# =============================================================================
+# SECTION RENDERING — cached per-section fragments stitched into one PDF
+# =============================================================================
+
+# Fragments are laid out without the page-number footer; stitch_sections()
+# stamps continuous numbers over the merged pages instead, so a section's
+# fragment stays valid when an earlier section grows or shrinks.
+FRAGMENT_CSS = """
+        @page {
+            @bottom-center { content: none; }
+        }
+
+        .link-stub {
+            height: 0;
+            margin: 0;
+        }
 """
 
 
+def section_ids(section_html):
+    return set(re.findall(r'\sid="([^"]+)"', section_html))
+
+
+def fragment_html(section_html):
+    """Build a standalone document for one section.
+
+    WeasyPrint drops links whose target is not in the same document, so every
+    cross-section target (the TOC links, mostly) gets an empty stub element.
+    stitch_sections() only keeps the destinations a section really defines.
+    """
+    own_ids = section_ids(section_html)
+    targets = dict.fromkeys(re.findall(r'href="#([^"]+)"', section_html))
+    stubs = "".join(f'<div class="link-stub" id="{t}"></div>' for t in targets if t not in own_ids)
+    return wrap_document(section_html + stubs)
+
+
+_fresh_fragments = set()  # keys rendered by this process, reused even with --no-cache
+
+
+def render_fragment(html_content, use_cache=True, extra_css=""):
+    """Render one standalone document to SECTION_CACHE_DIR.
+
+    Returns (path, rendered) where rendered is False on a cache hit.
+    """
+    key = cache_key(html_content, theme_css() + extra_css, screenshots=False)
+    if use_cache or key in _fresh_fragments:
+        cached = cache_lookup(key, SECTION_CACHE_DIR)
+        if cached is not None:
+            return cached, False
+    tmp = unique_temp(SECTION_CACHE_DIR, key)
+    try:
+        write_pdf(html_content, tmp, extra_css)
+        path = SECTION_CACHE_DIR / f"{key}.pdf"
+        tmp.replace(path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    _fresh_fragments.add(key)
+    return path, True
+
+
+STAMP_CHUNK_PAGES = 200
+
+
+def page_number_stamps(page_count, use_cache=True):
+    """Render page_count blank pages that carry only the @page footer.
+
+    The pages are laid out STAMP_CHUNK_PAGES at a time, each chunk's page
+    counter starting where the previous one ended. Layout memory therefore
+    stays flat however long the appendices get, and full chunks are reused
+    from the cache. Returns the chunk paths in page order.
+    """
+    paths = []
+    for first in range(0, page_count, STAMP_CHUNK_PAGES):
+        body = '<div class="page-break"></div>' * min(STAMP_CHUNK_PAGES, page_count - first)
+        css = f"@page :first {{ counter-set: page {first + 1}; }}"
+        path, _ = render_fragment(wrap_document(body, css), use_cache)
+        paths.append(path)
+    return paths
+
+
+def copy_outline(writer, reader, items, offset, parent=None):
+    """Recreate a fragment's bookmarks in writer, shifted by offset pages."""
+    last = None
+    for item in items:
+        if isinstance(item, list):
+            copy_outline(writer, reader, item, offset, last)
+        else:
+            page_number = offset + reader.get_destination_page_number(item)
+            last = writer.add_outline_item(item.title, page_number, parent=parent)
+
+
+def stitch_sections(fragments, stamp_paths, output_file):
+    """Merge (fragment_path, own_ids) pairs into output_file.
+
+    Page numbers come from the stamp documents, and named destinations and
+    bookmarks are rebuilt against the merged page list so TOC links resolve
+    across fragments. The writer holds every merged page until it writes,
+    so memory here grows with the size of the output PDF. output_file is
+    only replaced once the merged PDF is complete.
+    """
+    # pypdf is only needed for sectioned builds
+    from pypdf import PdfReader, PdfWriter
+    from pypdf.generic import Destination, Fit
+
+    writer = PdfWriter()
+    stamps = (page for path in stamp_paths for page in PdfReader(path).pages)
+    for path, own_ids in fragments:
+        reader = PdfReader(path)
+        offset = len(writer.pages)
+        for page in reader.pages:
+            writer.add_page(page).merge_page(next(stamps))
+        for name, dest in reader.named_destinations.items():
+            if name not in own_ids:
+                continue  # a link stub, the real target lives in another fragment
+            page = writer.pages[offset + reader.get_destination_page_number(dest)]
+            fit = Fit.xyz(dest.left, dest.top, dest.zoom)
+            writer.add_named_destination_object(Destination(name, page.indirect_reference, fit))
+        copy_outline(writer, reader, reader.outline, offset)
+    writer.add_metadata(pdf_info_dates())
+    output_file = Path(output_file)
+    tmp = output_file.with_name(output_file.name + ".stitch.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            writer.write(f)
+        tmp.replace(output_file)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def render_sections(sections, output_file, use_cache=True, jobs=1, extra_fragments=(),
+                    max_rss_mb=None):
+    """Render each (section_id, html) to its own cached fragment, then stitch.
+
+    Only sections whose HTML changed since the last run are laid out again.
+    WeasyPrint layout is single-threaded, so with jobs > 1 the fragments are
+    laid out concurrently in a process pool. extra_fragments, already
+    rendered (path, own_ids) pairs such as appendices, are stitched after
+    the sections, under max_rss_mb when given (see run_capped()).
+    """
+    from pypdf import PdfReader
+
+    docs = [fragment_html(html) for _, html in sections]
+    if jobs > 1:
+        with theme_pool(FRAGMENT_CSS, min(jobs, len(docs))) as pool:
+            n = len(docs)
+            results = list(pool.map(render_fragment, docs, [use_cache] * n, [FRAGMENT_CSS] * n))
+    else:
+        results = []
+        for (section_id, _), doc in zip(sections, docs):
+            with PROFILE.stage(f"section {section_id}"):
+                results.append(render_fragment(doc, use_cache, FRAGMENT_CSS))
+
+    # Pool workers only update their own copy of the set, so record here what
+    # they laid out; later variants in this build then reuse it
+    _fresh_fragments.update(path.stem for path, fresh in results if fresh)
+    fragments = [(path, section_ids(html)) for (path, _), (_, html) in zip(results, sections)]
+    fragments += extra_fragments
+    rendered = sum(fresh for _, fresh in results)
+
+    page_count = sum(len(PdfReader(path).pages) for path, _ in fragments)
+    stamp_paths = page_number_stamps(page_count, use_cache)
+    run_capped(max_rss_mb, stitch_sections, fragments, stamp_paths, output_file)
+    evict_cache(SECTION_CACHE_DIR)
+    print(f"Sections: {rendered} rendered, {len(sections) - rendered} reused from cache")
+
+
+# =============================================================================
+# APPENDICES — long data tables laid out in memory-bounded batches
+# =============================================================================
+
+# Rows are streamed from SQLite and laid out APPENDIX_BATCH_ROWS at a time in
+# a single worker process, so neither the HTML nor WeasyPrint's layout tree
+# for the whole table is ever held at once. Stitching the fragments into one
+# PDF and compact_pdf() need the whole document, so with appendices they run
+# in a worker of their own under the same --max-rss cap, and the build stops
+# with an error when that is too small. Order history deliberately leaves out
+# customer names and emails: the guide is emailed and hosted.
+APPENDICES = {
+    "catalog": {
+        "title": "Appendix A. Product Catalog",
+        "query": """SELECT name, category, price_cents, subscribable, active
+                    FROM products ORDER BY category, name""",
+        "columns": ["Product", "Category", "Price", "Subscribable", "Active"],
+    },
+    "order-history": {
+        "title": "Appendix B. Order History",
+        "query": """SELECT id, created_at, status, stage, items, total_cents
+                    FROM orders ORDER BY id""",
+        "columns": ["Order", "Date", "Status", "Stage", "Items", "Total"],
+    },
+    "time-slots": {
+        "title": "Appendix C. Pickup Time Slots",
+        "query": """SELECT day_of_week, start_time, end_time, capacity, active
+                    FROM time_slots ORDER BY day_of_week, start_time""",
+        "columns": ["Day", "Start", "End", "Capacity", "Active"],
+    },
+    "sales": {
+        "title": "Appendix D. Monthly Sales by Product",
+        # Read from the sales summary (refreshed first), not the orders table;
+        # the ? is bound to sales_summary.SALES_STATUSES
+        "source": "sales-summary",
+        "query": """SELECT substr(day, 1, 7) AS month, MAX(name), SUM(units), SUM(revenue_cents), SUM(orders)
+                    FROM daily_product_sales
+                    WHERE status IN (SELECT value FROM json_each(?))
+                    GROUP BY month, product_id ORDER BY month DESC, SUM(revenue_cents) DESC""",
+        "columns": ["Month", "Product", "Units", "Revenue", "Orders"],
+    },
+}
+
+APPENDIX_BATCH_ROWS = 400
+APPENDIX_MIN_BATCH_ROWS = 25
+APPENDIX_MAX_RSS_MB = 512
+APPENDIX_RECYCLE_FRACTION = 0.75  # restart the layout worker past this share of the cap
+
+
+def appendix_cells(name, row):
+    """Display values for one appendix row."""
+    yes_no = lambda flag: "Yes" if flag else "No"
+    if name == "catalog":
+        product, category, price, subscribable, active = row
+        return [product, category, format_cents(price or 0), yes_no(subscribable), yes_no(active)]
+    if name == "order-history":
+        order_id, created_at, status, stage, items, total = row
+        items = parse_json_column(items, [])
+        count = sum((i.get("quantity") or 1) for i in items if isinstance(i, dict)) if isinstance(items, list) else 0
+        return [f"#{order_id}", (created_at or "")[:10], status or "", stage or "", count, format_cents(total or 0)]
+    if name == "sales":
+        month, product, units, revenue, orders = row
+        return [month, product, units, format_cents(revenue or 0), orders]
+    day, start, end, capacity, active = row
+    return [DAY_NAMES[day] if 0 <= (day or 0) < 7 else day, start, end, capacity, yes_no(active)]
+
+
+def appendix_html(name, rows, part):
+    """One batch of an appendix table as a section div; part 0 carries the heading."""
+    spec = APPENDICES[name]
+    return template_env().get_template("appendices/table.html").render(
+        anchor=f"appendix-{name}" if part == 0 else f"appendix-{name}-{part}",
+        title=spec["title"],
+        columns=spec["columns"],
+        rows=[appendix_cells(name, row) for row in rows],
+        part=part,
+    )
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes (VmHWM on Linux)."""
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+_worker_base_rss = 0  # appendix worker's RSS when it started
+
+
+def init_appendix_worker():
+    """Record where the appendix worker's own memory use starts.
+
+    A forked worker's RSS and peak start out with the parent's pages
+    counted, so the cap is checked against growth past this baseline. On
+    Linux the inherited peak is reset first (/proc/self/clear_refs).
+    """
+    global _worker_base_rss
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+    except OSError:
+        pass
+    _worker_base_rss = current_rss()
+
+
+def render_bounded_fragment(html_content, use_cache=True):
+    """render_fragment() in the appendix worker, reporting how far the
+    worker's peak RSS has grown since it started."""
+    path, rendered = render_fragment(html_content, use_cache, FRAGMENT_CSS)
+    return path, rendered, max(peak_rss() - _worker_base_rss, 0)
+
+
+def render_appendices(names, db_path=DB_PATH, max_rss_mb=APPENDIX_MAX_RSS_MB,
+                      batch_rows=APPENDIX_BATCH_ROWS, use_cache=True):
+    """Lay out the named appendices batch by batch; returns [(fragment_path, own_ids)].
+
+    Each batch becomes a cached fragment like a guide section, ready for
+    stitch_sections(). Layout runs in one forked worker. When the worker's
+    peak RSS has grown by more than APPENDIX_RECYCLE_FRACTION of max_rss_mb
+    it is replaced by a fresh one, and past the whole cap the batch size is
+    halved, so layout memory follows the batch size rather than the row
+    count. render_pdf() holds stitching and compaction to max_rss_mb too.
+    Appendices whose source is the sales summary refresh it first (see
+    sales_summary.py) and read from its SALES_SUMMARY_FILE instead of
+    scanning orders.
+    """
+    max_rss = max_rss_mb * 2**20
+    fragments, rendered, recycled = [], 0, 0
+    pool = None
+    conn = connect_readonly(db_path)
+    summary = summary_params = None
+    if any(APPENDICES[name].get("source") == "sales-summary" for name in names):
+        import sales_summary  # imports this module, so only when needed
+
+        sales_summary.refresh_sales_summary(db_path)
+        summary = connect_readonly(sales_summary.SALES_SUMMARY_FILE)
+        summary_params = (json.dumps(list(sales_summary.SALES_STATUSES)),)
+    try:
+        for name in names:
+            if APPENDICES[name].get("source") == "sales-summary":
+                cursor = summary.execute(APPENDICES[name]["query"], summary_params)
+            else:
+                cursor = conn.execute(APPENDICES[name]["query"])
+            part = 0
+            while rows := cursor.fetchmany(batch_rows):
+                html = appendix_html(name, rows, part)
+                pool = pool or theme_pool(FRAGMENT_CSS, initializer=init_appendix_worker)
+                with PROFILE.stage(f"appendix {name} part {part}"):
+                    future = pool.submit(render_bounded_fragment, fragment_html(html), use_cache)
+                    path, fresh, worker_growth = future.result()
+                fragments.append((path, section_ids(html)))
+                rendered += fresh
+                if worker_growth > max_rss:
+                    batch_rows = max(batch_rows // 2, APPENDIX_MIN_BATCH_ROWS)
+                if worker_growth > max_rss * APPENDIX_RECYCLE_FRACTION:
+                    pool.shutdown()
+                    pool, recycled = None, recycled + 1
+                part += 1
+    finally:
+        conn.close()
+        if summary is not None:
+            summary.close()
+        if pool is not None:
+            pool.shutdown()
+    print(f"Appendices: {len(fragments)} batches, {rendered} rendered, "
+          f"{len(fragments) - rendered} reused from cache, worker restarted {recycled}x")
+    return fragments
+
+
+def init_capped_worker(max_rss):
+    """Pool initializer: let this worker's memory grow by at most max_rss bytes.
+
+    On Linux the address space is capped (RLIMIT_AS) at its current size plus
+    max_rss, so an allocation past the cap raises MemoryError instead of
+    growing the process; elsewhere run_capped() checks the peak afterwards.
+    """
+    init_appendix_worker()
+    try:
+        vm_size = int(Path("/proc/self/statm").read_text().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    limit = vm_size + max_rss if hard == resource.RLIM_INFINITY else min(vm_size + max_rss, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def capped_call(fn, *args):
+    """fn(*args) in the capped worker, with the worker's peak RSS growth."""
+    return fn(*args), max(peak_rss() - _worker_base_rss, 0)
+
+
+def run_capped(max_rss_mb, fn, *args):
+    """Return fn(*args), run in a fresh worker held to max_rss_mb of growth.
+
+    Used for the whole-document steps of an appendix build, so --max-rss
+    bounds the memory they add as well as appendix layout. When fn needs
+    more than that the build stops with an error rather than running
+    uncapped. max_rss_mb=None calls fn here.
+    """
+    if max_rss_mb is None:
+        return fn(*args)
+    max_rss = max_rss_mb * 2**20
+    growth = None
+    with theme_pool(initializer=init_capped_worker, initargs=(max_rss,)) as pool:
+        try:
+            result, growth = pool.submit(capped_call, fn, *args).result()
+        except (MemoryError, BrokenProcessPool):
+            pass
+    if growth is None or growth > max_rss:
+        raise SystemExit(f"{fn.__name__} needs more than --max-rss {max_rss_mb} MB for this PDF; "
+                         f"raise --max-rss or build fewer appendices")
+    return result
+
+
+# =============================================================================
+# PDF COMPACTION — post-processing pass before the guide is emailed or hosted
+# =============================================================================
+
+def compact_pdf(path, linearize=False):
+    """Shrink the PDF at path in place and return (bytes_before, bytes_after).
+
+    pypdf merges identical objects (the same screenshot or font subset
+    embedded by several stitched sections collapses to one XObject) and
+    recompresses page content streams. When pikepdf is installed the result
+    is also packed into object streams and, with linearize=True, linearized
+    for fast web view. The original is kept if the pass doesn't help.
+    """
+    from pypdf import PdfWriter
+
+    before = path.stat().st_size
+    tmp = path.with_name(path.name + ".compact.tmp")
+    with PROFILE.stage("pdf compact"):
+        try:
+            writer = PdfWriter(clone_from=str(path))
+            writer.compress_identical_objects()  # merge duplicates, drop orphans
+            for page in writer.pages:
+                page.compress_content_streams(level=9)
+            writer.write(str(tmp))
+
+            try:
+                import pikepdf
+            except ImportError:
+                if linearize:
+                    print("Linearization needs pikepdf (pip install pikepdf); skipped.")
+            else:
+                with pikepdf.open(tmp, allow_overwriting_input=True) as pdf:
+                    pdf.remove_unreferenced_resources()
+                    # The /ID is derived from the content rather than random
+                    pdf.save(tmp, compress_streams=True, linearize=linearize, deterministic_id=True,
+                             object_stream_mode=pikepdf.ObjectStreamMode.generate)
+        except BaseException:
+            tmp.unlink(missing_ok=True)  # out of memory under run_capped(), say
+            raise
+
+    if tmp.stat().st_size < before:
+        tmp.replace(path)
+    else:
+        tmp.unlink()
+    return before, path.stat().st_size
+
+
+# =============================================================================
+# WEB EDITION — static HTML with responsive, hashed, precompressed assets
+# =============================================================================
+
+# Screenshot renditions for srcset; phones pick the small ones
+WEB_IMAGE_WIDTHS = (480, 960, 1440)
+WEB_FALLBACK_WIDTH = 960  # src for browsers without srcset
+WEB_CONTENT_REM = 46
+WEB_PRECOMPRESS_MIN_SAVING = 0.10  # keep .gz/.br copies only when they are this much smaller
+
+# The theme is sized in points for letter paper; these override it for screens
+WEB_CSS = f"""
+        body {{
+            font-size: 16px;
+            max-width: {WEB_CONTENT_REM}rem;
+            margin: 0 auto;
+            padding: 0 1rem 3rem;
+        }}
+
+        h1 {{ font-size: 1.8rem; }}
+        h2 {{ font-size: 1.35rem; }}
+        h3 {{ font-size: 1.1rem; }}
+        h4 {{ font-size: 1rem; }}
+
+        .info-box, .tip-box, .warn-box, .critical-box {{
+            font-size: 0.95rem;
+        }}
+
+        table {{
+            display: block;
+            overflow-x: auto;
+            font-size: 0.9rem;
+        }}
+
+        th {{ font-size: 0.85rem; }}
+
+        img {{ height: auto; }}
+
+        .page-break {{ margin-top: 2.5rem; }}
+
+        .cover {{ padding-top: 3rem; }}
+
+        @media (max-width: 40rem) {{
+            .two-col {{ column-count: 1; }}
+        }}
+"""
+
+
+class WebAssets:
+    """The hashed asset files of one web edition.
+
+    Passed to img_tag() as its link argument while the sections render; every
+    add() writes a file under out_dir/assets/ named after a hash of its
+    bytes, so the files can be cached forever and pages pick up new names
+    when screenshots change.
+    """
+
+    def __init__(self, out_dir):
+        self.out_dir = Path(out_dir)
+        self.manifest = {}  # logical name -> hashed path relative to out_dir
+        self.written = []   # files new in this build, still to be precompressed
+
+    def add(self, name, source):
+        """Copy source into assets/ as <stem>.<hash><suffix>; returns its relative URL."""
+        data = Path(source).read_bytes()
+        stem, suffix = os.path.splitext(name)
+        url = f"assets/{stem}.{hashlib.sha256(data).hexdigest()[:12]}{suffix}"
+        target = self.out_dir / url
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_name(target.name + ".tmp")
+            tmp.write_bytes(data)
+            tmp.replace(target)
+            self.written.append(target)
+        self.manifest[name] = url
+        return url
+
+
+def precompress(path):
+    """Write path.gz and path.br next to path when they save WEB_PRECOMPRESS_MIN_SAVING.
+
+    Already-compressed images usually don't, and keep no copies. Returns the
+    suffixes written. gzip copies carry no timestamp, so they are reproducible.
+    """
+    import gzip
+
+    data = path.read_bytes()
+    encoders = {".gz": lambda d: gzip.compress(d, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:
+        pass
+    else:
+        encoders[".br"] = lambda d: brotli.compress(d, quality=11)
+
+    written = []
+    for suffix, encode in encoders.items():
+        copy = path.with_name(path.name + suffix)
+        packed = encode(data)
+        if len(packed) <= len(data) * (1 - WEB_PRECOMPRESS_MIN_SAVING):
+            copy.write_bytes(packed)
+            written.append(suffix)
+        else:
+            copy.unlink(missing_ok=True)
+    return written
+
+
+def write_web_page(sections, assets, page_name, title):
+    """Write sections as one standalone page in assets.out_dir, CSS inlined for first paint."""
+    page = assets.out_dir / page_name
+    page.parent.mkdir(parents=True, exist_ok=True)
+    with open(page, "w", encoding="utf-8") as f:
+        f.writelines(document_chunks(sections, theme_css() + WEB_CSS, title=title))
+    return page
+
+
+def finish_web_edition(assets, pages):
+    """Precompress pages and assets, write manifest.json and prune stale assets.
+
+    manifest.json lists every page in the output directory and maps each
+    logical asset name to its hashed file. It is merged with the previous
+    one, so building one variant into an existing edition keeps the other
+    pages. Assets are only pruned when no page on disk links to them. Anything
+    under assets/ is content-addressed and can be served with
+    "Cache-Control: public, max-age=31536000, immutable"; the pages keep
+    their names and should be revalidated. Returns the manifest.
+    """
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        print("Brotli copies need the brotli package (pip install brotli); writing gzip only.")
+
+    out_dir = assets.out_dir
+    manifest_file = out_dir / "manifest.json"
+    try:
+        previous = json.loads(manifest_file.read_text())
+    except (FileNotFoundError, ValueError):
+        previous = {}
+    page_names = {page.relative_to(out_dir).as_posix() for page in pages}
+    page_names.update(name for name in previous.get("pages", []) if (out_dir / name).is_file())
+
+    live = set(assets.manifest.values())
+    for name in page_names:
+        live.update(re.findall(r'assets/[^"\s,]+', (out_dir / name).read_text(encoding="utf-8")))
+    assets_dir = out_dir / "assets"
+    if assets_dir.exists():
+        for path in assets_dir.iterdir():
+            original = path.name.removesuffix(".gz").removesuffix(".br")
+            if f"assets/{original}" not in live:
+                path.unlink()
+
+    # Hashed files never change, so only new ones need compressing
+    compressed = sum(bool(precompress(path)) for path in [*assets.written, *pages])
+
+    merged = {**previous.get("assets", {}), **assets.manifest}
+    manifest = {
+        "pages": sorted(page_names),
+        "assets": dict(sorted((name, url) for name, url in merged.items() if url in live)),
+    }
+    manifest_file.write_text(json.dumps(manifest, indent=2) + "\n")
+    precompress(manifest_file)
+    print(f"Web edition: {len(page_names)} page(s), {len(live)} assets "
+          f"({len(assets.written)} new), {compressed} files precompressed")
+    return manifest
+
+
+# =============================================================================
+# WATCH MODE — rebuild on template/screenshot changes in a warm process
+# =============================================================================
+
+WATCH_DEBOUNCE_SECONDS = 0.3
+WATCH_POLL_SECONDS = 0.5
+
+
+def is_watched_file(path):
+    """Skip editor swap/backup files and our own output."""
+    name = path.name
+    return not (name.startswith(".") or name.endswith(("~", ".swp", ".tmp")) or path.suffix == ".pdf")
+
+
+class InotifyWatcher:
+    """Minimal inotify(7) directory watcher via ctypes, no extra dependency."""
+
+    MASK = 0x8 | 0x40 | 0x80 | 0x100 | 0x200  # CLOSE_WRITE, MOVED_FROM/TO, CREATE, DELETE
+    EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+
+    def __init__(self, dirs):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs = {}
+        for d in dirs:
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(d), self.MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"cannot watch {d}")
+            self._dirs[wd] = Path(d)
+
+    def poll(self, timeout=None):
+        """Return the set of paths changed within timeout seconds (None blocks)."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = set()
+        buf = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(buf):
+            wd, _, _, length = self.EVENT.unpack_from(buf, offset)
+            offset += self.EVENT.size
+            name = buf[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if name and wd in self._dirs:
+                changed.add(self._dirs[wd] / os.fsdecode(name))
+        return changed
+
+
+class PollingWatcher:
+    """Stat-polling fallback for platforms without inotify."""
+
+    def __init__(self, dirs):
+        self._dirs = [Path(d) for d in dirs]
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for d in self._dirs:
+            for path in d.iterdir():
+                if path.is_file():
+                    st = path.stat()
+                    snapshot[path] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def poll(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            current = self._scan()
+            changed = {p for p in current.keys() | self._snapshot.keys()
+                       if current.get(p) != self._snapshot.get(p)}
+            self._snapshot = current
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+            time.sleep(WATCH_POLL_SECONDS if deadline is None
+                       else max(0, min(WATCH_POLL_SECONDS, deadline - time.monotonic())))
+
+
+def make_watcher(dirs):
+    try:
+        return InotifyWatcher(dirs)
+    except (OSError, AttributeError, TypeError):
+        return PollingWatcher(dirs)
+
+
+def wait_for_changes(watcher):
+    """Block until something changes, then keep collecting until a quiet
+    WATCH_DEBOUNCE_SECONDS so one save (or a batch copy) triggers one build."""
+    changed = set()
+    while not changed:
+        changed = {p for p in watcher.poll() if is_watched_file(p)}
+    while True:
+        more = {p for p in watcher.poll(WATCH_DEBOUNCE_SECONDS) if is_watched_file(p)}
+        if not more:
+            return changed
+        changed |= more
+
+
+def watch(args):
+    """Rebuild the guide whenever a template or screenshot changes.
+
+    The process stays up, so imports, the Jinja environment, optimized images
+    and section memos stay warm, and rebuilds go through the per-section
+    fragment cache so only sections whose HTML changed are laid out again.
+    Edits to this script re-exec the process, since code can't be reloaded
+    in place.
+    """
+    args.incremental = True
+    script = Path(__file__).resolve()
+    dirs = [TEMPLATES_DIR, TEMPLATES_DIR / "sections", SCREENSHOTS_DIR, script.parent]
+    watcher = make_watcher([d for d in dirs if d.is_dir()])
+    print(f"Watching {TEMPLATES_DIR.name}/, {SCREENSHOTS_DIR.name}/ and {script.name} (Ctrl+C to stop)")
+    build(args)
+    try:
+        while True:
+            changed = wait_for_changes(watcher)
+            if script in {p.resolve() for p in changed}:
+                print(f"{script.name} changed, restarting...")
+                os.execv(sys.executable, [sys.executable, *sys.argv])
+            relevant = sorted(p.name for p in changed if p.parent != script.parent)
+            if not relevant:
+                continue
+            print(f"\nChanged: {', '.join(relevant)}")
+            start = time.perf_counter()
+            build(args)
+            print(f"Rebuilt in {time.perf_counter() - start:.2f}s")
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+
+
+# =============================================================================
+# RENDER SERVICE — warm local daemon for guides, slips and statements
+# =============================================================================
+
+SERVE_PORT = 8765
+SERVE_QUEUE_LIMIT = 32
+SERVE_MAX_BODY = 32 * 2**20
+
+# The only directories service jobs may read through file: URLs. The project
+# root itself holds .env and data/, so it is not listed.
+SERVE_FETCH_DIRS = (SCREENSHOTS_DIR, IMAGE_CACHE_DIR, TEMPLATES_DIR, PROJECT_DIR / "static")
+
+# POST path -> job kind, and the JSON fields each kind requires
+SERVE_ROUTES = {"/render/html": "html", "/render/template": "template", "/render/guide": "guide"}
+SERVE_REQUIRED = {"html": ("html",), "template": ("template",), "guide": ()}
+
+
+def warm_worker():
+    """Make sure WeasyPrint, fonts and the theme are loaded in this process.
+
+    Forked workers inherit all three from the parent already; this only does
+    work under other start methods.
+    """
+    font_config()
+    theme_stylesheet()
+    local_file_fetcher()
+
+
+def init_render_worker():
+    """Pool initializer: leave Ctrl+C to the parent, which shuts the pool down,
+    and confine fetches to SERVE_FETCH_DIRS."""
+    global FETCH_DIRS
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    FETCH_DIRS = SERVE_FETCH_DIRS
+    warm_worker()
+
+
+def render_job(job):
+    """Run one render-service job in a worker process and return the PDF bytes.
+
+    Kinds:
+      html      {"html": str, "css": str} — a full document, theme applied
+      template  {"template": path under guide-templates/, "context": {}, "css": str}
+      guide     {"variant": name or omitted for the full guide}
+    """
+    if job["kind"] == "guide":
+        manifest = load_variants() if job.get("variant") else {}
+        variant = manifest[job["variant"]] if job.get("variant") else None
+        sections = generate_sections(data=load_site_data(job["db"]), variant=variant)
+        fd, tmp = tempfile.mkstemp(suffix=".pdf", dir=CACHE_DIR)
+        os.close(fd)
+        try:
+            render_pdf(list(document_chunks(sections)), Path(tmp), sections=sections)
+            return Path(tmp).read_bytes()
+        finally:
+            os.unlink(tmp)
+
+    if job["kind"] == "template":
+        body = template_env().get_template(job["template"]).render(**job.get("context", {}))
+        html_content = wrap_document(body)
+    else:
+        html_content = job["html"]
+    out = io.BytesIO()
+    write_pdf(html_content, out, user_css=job.get("css", ""))
+    return out.getvalue()
+
+
+class RenderService:
+    """A pool of warm render workers behind a bounded job queue.
+
+    At most queue_limit jobs are accepted at once (running or waiting); the
+    pool runs `workers` of them concurrently. When a worker dies (killed for
+    memory, say) the pool is broken for good, so it is replaced; only the
+    jobs that were running on it fail.
+    """
+
+    def __init__(self, workers=1, queue_limit=SERVE_QUEUE_LIMIT, db_path=DB_PATH):
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        warm_worker()
+        self.workers = workers
+        # Start every worker now, before the server's threads exist
+        self.pool = self._start_pool()
+        self.queue_limit = queue_limit
+        self.db_path = db_path
+        self._slots = threading.BoundedSemaphore(queue_limit)
+        self._lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        self.counts = {"active": 0, "done": 0, "failed": 0, "rejected": 0, "restarts": 0}
+
+    def _start_pool(self, mp_context=None):
+        pool = theme_pool(FRAGMENT_CSS, self.workers, initializer=init_render_worker,
+                          mp_context=mp_context)
+        for future in [pool.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+        return pool
+
+    def _replace_pool(self, broken):
+        """Swap in a new pool for broken, once, however many jobs saw it break."""
+        with self._pool_lock:
+            if self.pool is not broken:
+                return
+            # The server's threads exist by now, so don't fork this process
+            # again; forkserver workers warm themselves in init_render_worker()
+            self.pool = self._start_pool(multiprocessing.get_context("forkserver"))
+            self._count(restarts=1)
+        broken.shutdown(wait=False)
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self.counts[name] += delta
+
+    def run(self, job):
+        """Render job and return PDF bytes, or None when the queue is full."""
+        if not self._slots.acquire(blocking=False):
+            self._count(rejected=1)
+            return None
+        self._count(active=1)
+        job = dict(job, db=str(self.db_path))
+        pool = self.pool
+        try:
+            try:
+                future = pool.submit(render_job, job)
+            except BrokenProcessPool:
+                # It broke before this job was queued, so the job is not to blame
+                self._replace_pool(pool)
+                pool = self.pool
+                future = pool.submit(render_job, job)
+            pdf = future.result()
+        except BrokenProcessPool:
+            self._count(failed=1)
+            self._replace_pool(pool)
+            raise
+        except Exception:
+            self._count(failed=1)
+            raise
+        finally:
+            self._count(active=-1)
+            self._slots.release()
+        self._count(done=1)
+        return pdf
+
+    def status(self):
+        with self._lock:
+            return dict(self.counts, workers=self.workers, queue_limit=self.queue_limit)
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """GET /health, and POST /render/{html,template,guide} with a JSON job body."""
+
+    def address_string(self):
+        # Unix-socket clients have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self.send_json(404, {"error": f"unknown path {self.path}"})
+        self.send_json(200, self.server.service.status())
+
+    def do_POST(self):
+        kind = SERVE_ROUTES.get(self.path)
+        if kind is None:
+            return self.send_json(404, {"error": f"unknown path {self.path}"})
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > SERVE_MAX_BODY:
+            return self.send_json(413, {"error": f"job larger than {SERVE_MAX_BODY} bytes"})
+        try:
+            job = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            return self.send_json(400, {"error": f"invalid JSON: {e}"})
+        if not isinstance(job, dict):
+            return self.send_json(400, {"error": "job must be a JSON object"})
+        missing = [field for field in SERVE_REQUIRED[kind] if not job.get(field)]
+        if missing:
+            return self.send_json(400, {"error": f"missing field(s): {', '.join(missing)}"})
+
+        start = time.perf_counter()
+        try:
+            pdf = self.server.service.run(dict(job, kind=kind))
+        except (KeyError, jinja2.TemplateNotFound) as e:
+            return self.send_json(400, {"error": f"not found: {e}"})
+        except FetchRefused as e:
+            return self.send_json(400, {"error": str(e)})
+        except Exception as e:
+            return self.send_json(500, {"error": f"{type(e).__name__}: {e}"})
+        if pdf is None:
+            return self.send_json(503, {"error": "render queue full, retry later"})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(pdf)))
+        self.send_header("X-Render-Seconds", f"{time.perf_counter() - start:.3f}")
+        self.end_headers()
+        self.wfile.write(pdf)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(args):
+    """Run the render service until interrupted.
+
+    Listens on 127.0.0.1:--port, or on --socket when given (for the admin
+    panel on the same host). Warm workers keep WeasyPrint, fonts and the
+    compiled theme loaded, so a request costs only its own layout time.
+    """
+    service = RenderService(workers=max(args.jobs, 1), queue_limit=args.queue_limit, db_path=args.db)
+    if args.socket:
+        args.socket.unlink(missing_ok=True)
+        server = UnixHTTPServer(str(args.socket), RenderRequestHandler)
+        where = f"unix:{args.socket}"
+    else:
+        server = ThreadingHTTPServer(("127.0.0.1", args.port), RenderRequestHandler)
+        where = f"http://127.0.0.1:{args.port}"
+    server.service = service
+    print(f"Render service on {where} with {service.workers} worker(s), "
+          f"queue limit {service.queue_limit} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping render service.")
+    finally:
+        server.server_close()
+        service.close()
+        if args.socket:
+            args.socket.unlink(missing_ok=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the Odd Fellow Coffee user guide PDF.")
+    parser.add_argument("-o", "--output", type=Path, default=OUTPUT_FILE,
+                        help=f"PDF path to write (default: {OUTPUT_FILE.name})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always re-render with WeasyPrint and skip the render cache")
+    parser.add_argument("--link-images", action="store_true",
+                        help="reference screenshots by file path instead of inlining base64 data")
+    parser.add_argument("--db", type=Path, default=DB_PATH,
+                        help="SQLite database for the catalog, slot and drop tables (default: $DB_PATH or data/odd-fellow.db)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="render each section separately and reuse unchanged sections from the cache")
+    parser.add_argument("-j", "--jobs", type=int, default=1, metavar="N",
+                        help="lay out sections in N parallel processes (implies --incremental)")
+    parser.add_argument("--profile", action="store_true",
+                        help="report wall time and memory per build stage (worker processes are not profiled)")
+    parser.add_argument("--pstats", type=Path, metavar="FILE",
+                        help="also dump a cProfile/pstats file of the build (implies --profile)")
+    parser.add_argument("--trace", type=Path, metavar="FILE",
+                        help="also write a Chrome trace JSON of the build stages (implies --profile)")
+    parser.add_argument("--watch", action="store_true",
+                        help="stay running and rebuild when templates or screenshots change")
+    parser.add_argument("--variants", nargs="*", metavar="NAME",
+                        help="build audience variants from the manifest instead of the full guide (all when no names given)")
+    parser.add_argument("--manifest", type=Path, default=VARIANTS_FILE,
+                        help=f"variant manifest (default: {VARIANTS_FILE.relative_to(PROJECT_DIR)})")
+    parser.add_argument("--output-dir", type=Path, default=PROJECT_DIR,
+                        help="directory for variant PDFs (default: project root)")
+    parser.add_argument("--no-compact", action="store_true",
+                        help="skip the PDF size-reduction pass (object dedup, stream recompression)")
+    parser.add_argument("--linearize", action="store_true",
+                        help="linearize the PDF for fast web view (requires pikepdf)")
+    parser.add_argument("--appendices", nargs="*", choices=list(APPENDICES), metavar="NAME",
+                        help=f"append data tables from the database, laid out in memory-bounded batches "
+                             f"(choices: {', '.join(APPENDICES)}; all when no names given)")
+    parser.add_argument("--max-rss", type=int, default=APPENDIX_MAX_RSS_MB, metavar="MB",
+                        help=f"cap on the memory growth of appendix layout and of stitching and "
+                             f"compacting a guide with appendices (default: {APPENDIX_MAX_RSS_MB})")
+    parser.add_argument("--serve", action="store_true",
+                        help="run a local render service with -j warm workers instead of building once")
+    parser.add_argument("--port", type=int, default=SERVE_PORT,
+                        help=f"--serve: TCP port on 127.0.0.1 (default: {SERVE_PORT})")
+    parser.add_argument("--socket", type=Path, metavar="PATH",
+                        help="--serve: listen on this Unix socket instead of TCP")
+    parser.add_argument("--queue-limit", type=int, default=SERVE_QUEUE_LIMIT, metavar="N",
+                        help=f"--serve: jobs accepted at once before answering 503 (default: {SERVE_QUEUE_LIMIT})")
+    parser.add_argument("--html-only", action="store_true",
+                        help="write a browser preview (.html next to the PDF path, images linked) and skip WeasyPrint")
+    parser.add_argument("--web", nargs="?", type=Path, const=WEB_DIR, metavar="DIR",
+                        help="write the static web edition (responsive lazy-loaded screenshots, hashed and "
+                             "precompressed assets, manifest.json) to DIR instead of a PDF (default: static/guide)")
+    args = parser.parse_args(argv)
+    if args.appendices == []:
+        args.appendices = list(APPENDICES)
+    return args
+
+
+def build_targets(args):
+    """[(output_path, variant_or_None)] for the documents this run produces."""
+    if args.variants is None:
+        return [(args.output, None)]
+    manifest = load_variants(args.manifest)
+    names = args.variants or list(manifest)
+    unknown = [n for n in names if n not in manifest]
+    if unknown:
+        raise SystemExit(f"Unknown variant(s): {', '.join(unknown)} (manifest has: {', '.join(manifest)})")
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    return [(args.output_dir / manifest[n]["output"], manifest[n]) for n in names]
+
+
+def build(args):
+    """Generate the guide, or each requested variant, once for parsed CLI args.
+
+    Variants are always rendered per section: they share section HTML,
+    optimized screenshots, the compiled stylesheet and laid-out fragments,
+    so building all of them costs about one full guide.
+    """
+    with PROFILE.stage("total"):
+        with PROFILE.stage("site data"):
+            data = load_site_data(args.db, use_cache=not args.no_cache)
+        appendices = []
+        if args.appendices and args.variants is not None:
+            print("Appendices are only added to the full guide; "
+                  "ignoring --appendices for --variants.")
+        elif args.appendices and not (args.html_only or args.web):
+            if data is None:
+                print(f"No database at {args.db}; skipping appendices.")
+            else:
+                with PROFILE.stage("appendices"):
+                    appendices = render_appendices(args.appendices, args.db, args.max_rss,
+                                                   use_cache=not args.no_cache)
+        web = WebAssets(args.web) if args.web else None
+        web_pages = []
+        for output, variant in build_targets(args):
+            if web is not None:
+                # The full guide is the edition's index; variants sit beside it
+                page_name = "index.html" if variant is None else output.with_suffix(".html").name
+                title = variant["title"] if variant else f"Odd Fellow Coffee — {GUIDE_SUBTITLE}"
+                print(f"Generating web edition of {variant['title'] if variant else 'user guide'}: {page_name}")
+                with PROFILE.stage("html assembly"):
+                    sections = generate_sections(link_images=web, data=data, variant=variant)
+                    web_pages.append(write_web_page(sections, web, page_name, title))
+                continue
+            if args.html_only:
+                output = output.with_suffix(".html")
+                output.parent.mkdir(parents=True, exist_ok=True)
+            print(f"Generating {variant['title'] if variant else 'user guide'}: {output}")
+            # Previews link screenshots relative to wherever the HTML lands
+            link_images = output.parent.resolve() if args.html_only else args.link_images
+            with PROFILE.stage("html assembly"):
+                sections = generate_sections(link_images=link_images, data=data, variant=variant)
+                if args.html_only:
+                    write_html(sections, output)
+                    print(f"Done! HTML saved to: {output}")
+                    continue
+                html_content = list(document_chunks(sections))
+            sectioned = variant is not None or args.incremental or args.jobs > 1 or appendices
+            hit = render_pdf(html_content, output, use_cache=not args.no_cache,
+                             sections=sections if sectioned else None, jobs=args.jobs,
+                             compact=not args.no_compact, linearize=args.linearize,
+                             extra_fragments=appendices if variant is None else (),
+                             max_rss_mb=args.max_rss if appendices and variant is None else None)
+            if hit:
+                print("Render cache hit — unchanged, reused previous PDF.")
+            print(f"Done! PDF saved to: {output}")
+        if web is not None:
+            finish_web_edition(web, web_pages)
+            print(f"Done! Web edition saved to: {web.out_dir}")
+
+
+def main(argv=None):
+    global PROFILE
+    args = parse_args(argv)
+    if args.watch:
+        watch(args)
+        return
+    if args.serve:
+        serve(args)
+        return
+    if args.profile or args.pstats or args.trace:
+        PROFILE = BuildProfile(enabled=True)
+    profiler = cProfile.Profile() if args.pstats else None
+
+    if profiler:
+        profiler.enable()
+    build(args)
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.pstats)
+
+    if PROFILE.enabled:
+        print()
+        print(PROFILE.report())
+        if args.pstats:
+            print(f"cProfile stats saved to: {args.pstats}")
+        if args.trace:
+            PROFILE.write_chrome_trace(args.trace)
+            print(f"Chrome trace saved to: {args.trace}")
+
+
 if __name__ == "__main__":
-    print(f"Generating user guide: {OUTPUT_FILE}")
-    html_content = generate_html()
-    HTML(string=html_content).write_pdf(str(OUTPUT_FILE))
-    print(f"Done! PDF saved to: {OUTPUT_FILE}")
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Odd Fellow Coffee — Sales Summary
+=================================
+Keeps daily sales aggregates in a summary database so revenue and
+product-mix questions don't mean JSON-parsing every order's items:
+- daily_product_sales: units, revenue and orders per day, product and status
+- daily_sales: orders, order totals and shipping per day and status
+
+Each run reads only orders past the stored orders.id high-water mark plus
+orders whose status can still change, so its cost follows new activity
+rather than total history. The user guide's sales appendix refreshes and
+reads the same summary. The app database is only ever opened read-only.
+
+Usage:
+    python sales_summary.py                  # refresh, then report the last 30 days
+    python sales_summary.py --days 90 --months 24
+    python sales_summary.py --rebuild
+"""
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import argparse
+import json
+import sqlite3
+import sys
+import time
+
+import generate_user_guide as guide
+
+SALES_SUMMARY_FILE = guide.CACHE_DIR / "sales-summary.db"
+
+# Statuses that count as a sale; pending checkouts and expired ones don't.
+# "fulfilled" is the storefront's end state (VALID_ORDER_STATUSES in
+# validation.ts), "shipped"/"delivered" the admin's.
+SALES_STATUSES = ("confirmed", "fulfilled", "shipped", "delivered")
+
+# Orders in these statuses can still move (pending -> confirmed/expired,
+# confirmed -> fulfilled or shipped -> delivered), so they are re-checked on every refresh
+# until they are SALES_SETTLE_DAYS old. Pickup orders often stay "confirmed"
+# for good, so without the cutoff the re-checked set would grow with history.
+OPEN_ORDER_STATUSES = ("pending", "confirmed", "shipped")
+SALES_SETTLE_DAYS = 60
+
+SALES_SUMMARY_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS etl_state (key TEXT PRIMARY KEY, value TEXT);
+    CREATE TABLE IF NOT EXISTS daily_product_sales (
+        day TEXT NOT NULL, product_id INTEGER NOT NULL, status TEXT NOT NULL, name TEXT,
+        units INTEGER NOT NULL, revenue_cents INTEGER NOT NULL, orders INTEGER NOT NULL,
+        PRIMARY KEY (day, product_id, status));
+    CREATE TABLE IF NOT EXISTS daily_sales (
+        day TEXT NOT NULL, status TEXT NOT NULL,
+        orders INTEGER NOT NULL, total_cents INTEGER NOT NULL, shipping_cents INTEGER NOT NULL,
+        PRIMARY KEY (day, status));
+    CREATE TABLE IF NOT EXISTS open_orders (order_id INTEGER PRIMARY KEY, status TEXT NOT NULL);"""
+
+# New orders past the high-water mark, then open orders re-read by rowid.
+# created_at is UTC; days are bucketed in local time like the admin calendar.
+SALES_ORDERS_QUERY = """
+    SELECT id, date(created_at, 'localtime'), created_at, status, items, total_cents,
+           COALESCE(shipping_cents, 0)
+    FROM orders WHERE id > ? AND id <= ?
+    UNION ALL
+    SELECT id, date(created_at, 'localtime'), created_at, status, items, total_cents,
+           COALESCE(shipping_cents, 0)
+    FROM orders WHERE id IN (SELECT value FROM json_each(?)) AND id <= ?
+    ORDER BY id"""
+
+DEFAULT_DAYS = 30
+DEFAULT_MONTHS = 12
+
+MONTHLY_QUERY = """
+    SELECT substr(day, 1, 7) AS month, SUM(orders), SUM(total_cents), SUM(shipping_cents)
+    FROM daily_sales
+    WHERE status IN (SELECT value FROM json_each(?))
+    GROUP BY month ORDER BY month DESC LIMIT ?"""
+
+TOP_PRODUCTS_QUERY = """
+    SELECT MAX(name), SUM(units), SUM(revenue_cents), SUM(orders)
+    FROM daily_product_sales
+    WHERE status IN (SELECT value FROM json_each(?)) AND day >= ?
+    GROUP BY product_id ORDER BY SUM(revenue_cents) DESC"""
+
+
+# =============================================================================
+# SUMMARY TABLES — daily per-product aggregates maintained incrementally
+# =============================================================================
+
+def order_sales_lines(items_json, products):
+    """[(product_id, name, units, revenue_cents)] for one order's items.
+
+    The cart JSON carries productId and quantity, and price_cents/name only
+    sometimes, so the rest comes from the products table.
+    """
+    items = guide.parse_json_column(items_json, [])
+    lines = []
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        product_id = item.get("productId") or 0
+        name, price = products.get(product_id, (None, 0))
+        units = item.get("quantity") or 1
+        lines.append((product_id, name or item.get("name") or "Other", units,
+                      (item.get("price_cents") or price or 0) * units))
+    return lines
+
+
+def refresh_sales_summary(db_path=guide.DB_PATH, summary_path=SALES_SUMMARY_FILE, rebuild=False):
+    """Fold orders added or changed since the last refresh into summary_path.
+
+    Only orders past the orders.id high-water mark and those still in an
+    OPEN_ORDER_STATUSES status (for up to SALES_SETTLE_DAYS) are read; a
+    status change moves the order's contribution from its old status bucket
+    to the new one. All writes are executemany upserts in one transaction.
+    The summary is rebuilt from scratch when it belongs to another database
+    or the orders table was reset. Returns {"new", "changed", "high_water", "seconds"}.
+    """
+    start = time.perf_counter()
+    key = str(Path(db_path).resolve())
+    summary_path.parent.mkdir(parents=True, exist_ok=True)
+    summary = sqlite3.connect(summary_path)
+    summary.executescript(SALES_SUMMARY_SCHEMA)
+    state = dict(summary.execute("SELECT key, value FROM etl_state"))
+
+    conn = guide.connect_readonly(db_path)
+    try:
+        max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM orders").fetchone()[0]
+        high_water = int(state.get("high_water_id", 0))
+        if rebuild or state.get("db", key) != key or max_id < high_water:
+            with summary:
+                for table in ("daily_product_sales", "daily_sales", "open_orders", "etl_state"):
+                    summary.execute(f"DELETE FROM {table}")
+            high_water = 0
+        known_open = dict(summary.execute("SELECT order_id, status FROM open_orders"))
+        products = {pid: (name, price) for pid, name, price in
+                    conn.execute("SELECT id, name, price_cents FROM products")}
+
+        product_deltas, day_deltas = {}, {}
+        opened, closed = [], []
+        new = changed = 0
+        last_created = state.get("high_water_created_at")
+
+        def apply(day, status, items, total, shipping, sign):
+            d = day_deltas.setdefault((day, status), [0, 0, 0])
+            d[0] += sign
+            d[1] += sign * (total or 0)
+            d[2] += sign * shipping
+            for product_id, name, units, revenue in order_sales_lines(items, products):
+                p = product_deltas.setdefault((day, product_id, status), [name, 0, 0, 0])
+                p[1] += sign * units
+                p[2] += sign * revenue
+                p[3] += sign
+
+        settled = datetime.now(timezone.utc) - timedelta(days=SALES_SETTLE_DAYS)
+        settled = settled.strftime("%Y-%m-%d %H:%M:%S")
+        params = (high_water, max_id, json.dumps(list(known_open)), high_water)
+        rows = conn.execute(SALES_ORDERS_QUERY, params)
+        for order_id, day, created_at, status, items, total, shipping in rows:
+            status = status or "pending"
+            if order_id > high_water:
+                new += 1
+                last_created = created_at
+                apply(day, status, items, total, shipping, 1)
+            elif status != known_open[order_id]:
+                changed += 1
+                apply(day, known_open[order_id], items, total, shipping, -1)
+                apply(day, status, items, total, shipping, 1)
+            elif (created_at or "") >= settled:
+                continue
+            open_now = status in OPEN_ORDER_STATUSES and (created_at or "") >= settled
+            (opened if open_now else closed).append((order_id, status))
+    finally:
+        conn.close()
+
+    with summary:
+        summary.executemany("""
+            INSERT INTO daily_product_sales
+                (day, product_id, status, name, units, revenue_cents, orders)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (day, product_id, status) DO UPDATE SET
+                name = excluded.name, units = units + excluded.units,
+                revenue_cents = revenue_cents + excluded.revenue_cents,
+                orders = orders + excluded.orders""",
+            [(*k, *v) for k, v in product_deltas.items()])
+        summary.executemany("""
+            INSERT INTO daily_sales (day, status, orders, total_cents, shipping_cents)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (day, status) DO UPDATE SET
+                orders = orders + excluded.orders, total_cents = total_cents + excluded.total_cents,
+                shipping_cents = shipping_cents + excluded.shipping_cents""",
+            [(*k, *v) for k, v in day_deltas.items()])
+        summary.execute("DELETE FROM daily_product_sales WHERE orders = 0")
+        summary.execute("DELETE FROM daily_sales WHERE orders = 0")
+        summary.executemany("INSERT OR REPLACE INTO open_orders (order_id, status) VALUES (?, ?)",
+                            opened)
+        summary.executemany("DELETE FROM open_orders WHERE order_id = ?",
+                            [(order_id,) for order_id, _ in closed])
+        summary.executemany("INSERT OR REPLACE INTO etl_state (key, value) VALUES (?, ?)",
+                            [("db", key), ("high_water_id", str(max_id)),
+                             ("high_water_created_at", last_created or "")])
+    summary.close()
+    return {"new": new, "changed": changed, "high_water": max_id,
+            "seconds": round(time.perf_counter() - start, 3)}
+
+
+# =============================================================================
+# REPORT
+# =============================================================================
+
+def print_report(summary_path, days=DEFAULT_DAYS, months=DEFAULT_MONTHS):
+    """Monthly revenue and the product mix of the last `days` days, from the summary alone."""
+    statuses = json.dumps(list(SALES_STATUSES))
+    since = (guide.build_datetime().date() - timedelta(days=days)).isoformat()
+    conn = guide.connect_readonly(summary_path)
+    try:
+        monthly = conn.execute(MONTHLY_QUERY, (statuses, months)).fetchall()
+        products = conn.execute(TOP_PRODUCTS_QUERY, (statuses, since)).fetchall()
+    finally:
+        conn.close()
+
+    print(f"\n{'Month':<10} {'Orders':>8} {'Revenue':>12} {'Shipping':>10}")
+    for month, orders, total, shipping in monthly:
+        print(f"{month:<10} {orders:>8,} {guide.format_cents(total):>12} {guide.format_cents(shipping):>10}")
+    print(f"\nLast {days} days by product:\n{'Product':<32} {'Units':>8} {'Revenue':>12} {'Orders':>8}")
+    for name, units, revenue, orders in products:
+        print(f"{(name or 'Other')[:32]:<32} {units:>8,} {guide.format_cents(revenue):>12} {orders:>8,}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh the daily sales summary and report from it.")
+    parser.add_argument("--db", type=Path, default=guide.DB_PATH,
+                        help="SQLite database (default: $DB_PATH or data/odd-fellow.db)")
+    parser.add_argument("--summary", type=Path, default=SALES_SUMMARY_FILE,
+                        help="summary database (default: .guide-cache/sales-summary.db)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="discard the summary and re-aggregate every order, e.g. after "
+                             "editing orders that were already delivered")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS,
+                        help=f"product mix window in days (default: {DEFAULT_DAYS})")
+    parser.add_argument("--months", type=int, default=DEFAULT_MONTHS,
+                        help=f"months of revenue to list (default: {DEFAULT_MONTHS})")
+    parser.add_argument("--no-report", action="store_true", help="refresh only")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.db.exists():
+        print(f"Database not found: {args.db}", file=sys.stderr)
+        return 1
+    try:
+        stats = refresh_sales_summary(args.db, args.summary, rebuild=args.rebuild)
+    except sqlite3.OperationalError as e:
+        print(f"Could not update {args.summary}: {e}", file=sys.stderr)
+        return 1
+    print(f"Summary updated: {stats['new']:,} new and {stats['changed']:,} changed orders "
+          f"in {stats['seconds']:.2f}s (high-water order id {stats['high_water']})")
+    if not args.no_report:
+        print_report(args.summary, args.days, args.months)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())